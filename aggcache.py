@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def fingerprint(data):
+    # load_clean() stamps the frame with its source hash; other frames are hashed by content
+    fp = data.attrs.get('fingerprint')
+    if fp is None:
+        fp = format(int(pd.util.hash_pandas_object(data, index=False).sum()) & (2**64 - 1), '016x')
+    return fp
+
+
+class AggregateCache:
+    """Bounded LRU cache of computed aggregates keyed by (dataset fingerprint, computation name).
+
+    Shared by every session and background job of the app process, so access is
+    guarded by a lock. Computation happens outside the lock; a caller missing a key
+    that is already being computed waits for that result instead of computing it again.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, fingerprint, name, compute):
+        key = (fingerprint, name)
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # If the other computation fails (or its entry is evicted at once) this caller computes
+            pending.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
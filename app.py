@@ -1,37 +1,306 @@
+import math
+import os
+import uuid
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
 import numpy as np
 
-@st.cache_data
+from aggcache import AggregateCache, fingerprint
+from correlation import CorrelationEngine
+from crosstab import FACTORS, age_groups, factor_table, stroke_crosstab
+from boxstats import grouped_box_stats
+from chartspec import MEASURES, STROKE_PIES
+from cohort import CATEGORY_COLUMNS, RANGE_COLUMNS, CohortIndex, describe_cohort, take_rows
+from incremental import IncrementalStore
+from ingest import CATEGORIES, clean, freeze, load_clean, load_profile, read_csv_typed, source_key
+from instrument import REGISTRY, section
+from intervals import CONFIDENCE, interval_table, stroke_rate_intervals
+from jobs import JobScheduler
+from settings import (AGGREGATE_CACHE_SIZE, APPEND_GLOB, BOOTSTRAP_RESAMPLES, BOOTSTRAP_SEED, CHUNK_ROWS, DATA_PATH,
+                      FIGURE_CACHE_BYTES, FIGURE_FORMAT, FIGURE_THEME, INCREMENTAL, JOB_POLL_SECONDS, JOB_WORKERS,
+                      MAX_FLIERS, MISSING_POLICY, PLOTLY_PAYLOAD_BUDGET, RAW_RENDER_MAX_ROWS, RENDERER, SHARED_DIR,
+                      STREAMING, METRICS_DIR, STREAMING_THRESHOLD_MB, WORKERS)
+from parallel import ParallelAggregator
+from quality import category_table, column_table
+from shared import SharedDataset
+from streaming import summarize_csv
+
+# Per-section timings of this rerun, shown in the diagnostics panel
+run_records = REGISTRY.begin_run()
+
+@st.cache_resource
 def load_data():
-    data = pd.read_csv('healthcare-dataset-stroke-data.csv')
-    # Replace string "Unknown"
+    # Typed parse with "Unknown"/"N/A" as NA, served from a cached columnar snapshot
     # *Note: "Unknown" in smoking_status means that the information is unavailable for this patient
-    data.replace("Unknown", pd.NA, inplace=True)
-    # Drop rows with Nan values
-    data.dropna(inplace = True)
-    # Reset index after dropping rows
-    data.reset_index(drop=True, inplace=True)
-    return data
+    # One read-only frame per process: cache_resource hands every session the same object,
+    # where cache_data would unpickle a private copy for each caller
+    return freeze(load_clean())
+
+@st.cache_resource
+def shared_dataset():
+    # Attaches to the copy published for every app process on the host
+    return SharedDataset(SHARED_DIR, DATA_PATH)
+
+@st.cache_resource
+def aggregate_cache():
+    # One cache per app process, shared by every session and rerun
+    return AggregateCache(max_entries=AGGREGATE_CACHE_SIZE)
+
+@st.cache_resource
+def figure_cache():
+    # matplotlib is only imported once the first figure is drawn
+    from figcache import FigureCache
+    return FigureCache(max_bytes=FIGURE_CACHE_BYTES)
+
+@st.cache_resource
+def scheduler():
+    # Worker threads shared by every session; identical requests from several sessions run once
+    return JobScheduler(JOB_WORKERS)
+
+@st.cache_resource
+def aggregator():
+    # Process pool shared by every session; only used when more than one worker is configured
+    return ParallelAggregator(WORKERS)
+
+@st.cache_resource
+def load_summary(data_fingerprint):
+    # Bounded memory: only one chunk of the CSV is held at a time (per worker)
+    if WORKERS > 1:
+        return aggregator().summarize_csv(DATA_PATH, chunksize=CHUNK_ROWS)
+    return summarize_csv(DATA_PATH, chunksize=CHUNK_ROWS)
+
+@st.cache_resource
+def incremental_store():
+    # Follows the registry as it grows; every session reads the store's latest snapshot
+    return IncrementalStore(DATA_PATH, append_glob=APPEND_GLOB)
+
+@st.cache_resource(max_entries=2)
+def quality_profile(data_fingerprint):
+    # Computed in the same pass as the parse and cached next to the snapshot
+    return load_profile()
+
+@st.cache_resource(max_entries=2)
+def risk_model(data_fingerprint, _data):
+    # Trained once per dataset version, then memory-mapped from disk by every later process
+    from model import train_or_load
+    return train_or_load(_data)
+
+@st.cache_resource(max_entries=4)
+def cohort_index(data_fingerprint, _data):
+    # Built once per dataset version and shared by every session; old versions are evicted
+    return CohortIndex(_data)
+
+# Sidebar for navigation
+st.sidebar.header('Chart Selection')
+chart_type = st.sidebar.selectbox(
+    "Select the chart you want to view",
+    ("Distributions of Age, Glucose, and BMI", "Box Plots", "Pie Charts", "Correlation Matrix")
+)
 
-data = load_data()
+# Each chart type remembers its own renderer; Plotly charts zoom and hover in the browser
+renderer = st.sidebar.radio('Renderer', ('matplotlib', 'plotly'), index=int(RENDERER == 'plotly'),
+                            key=f'renderer:{chart_type}', horizontal=True)
+
+# Large extracts are folded chunk by chunk into summaries instead of being loaded into memory
+streaming = STREAMING == '1' or (STREAMING == 'auto' and os.path.getsize(DATA_PATH) > STREAMING_THRESHOLD_MB * 2**20)
+
+if streaming:
+    data = None
+    data_fingerprint = source_key(DATA_PATH)[:16] + '-stream'
+    with section('ingest') as span:
+        summary = load_summary(data_fingerprint)
+        span.rows = summary.rows
+    st.sidebar.caption(f'Streaming mode: {summary.rows} patients summarized in chunks; cohort filtering is unavailable.')
+    if MISSING_POLICY != 'drop':
+        st.sidebar.warning(f"Streaming mode always drops rows with missing values; the "
+                           f"'{MISSING_POLICY}' missing value policy is not applied.")
+else:
+    if INCREMENTAL:
+        # New rows are parsed and folded into the running aggregates on the next rerun
+        with section('ingest') as span:
+            snapshot = incremental_store().refresh()
+            data, summary = snapshot.data, snapshot.summary
+            span.rows = len(data)
+        st.sidebar.caption(f'Incremental mode: {len(data)} patients, store version {snapshot.version}.')
+        if MISSING_POLICY != 'drop':
+            st.sidebar.warning(f"Incremental mode always drops rows with missing values; the "
+                               f"'{MISSING_POLICY}' missing value policy is not applied.")
+    else:
+        summary = None
+        with section('ingest') as span:
+            # Re-attaches on the rerun after a new version is published
+            data = shared_dataset().current() if SHARED_DIR else load_data()
+            span.rows = len(data)
+    data_fingerprint = fingerprint(data)
+    # The risk models are trained on every patient, whatever cohort is selected
+    dataset, dataset_fingerprint = data, data_fingerprint
+
+    # Cohort filter: every section below works on the selected patients only
+    index = cohort_index(data_fingerprint, data)
+    cohort = {'categories': {}, 'ranges': {}}
+    with st.sidebar.expander('Cohort Filter'):
+        for column in CATEGORY_COLUMNS:
+            levels = index.levels[column]
+            cohort['categories'][column] = st.multiselect(
+                column, levels, default=levels,
+                # hypertension / heart_disease are 0/1 flags
+                format_func=lambda level: level if isinstance(level, str) else ('Yes' if level else 'No'))
+        for column in RANGE_COLUMNS:
+            low, high = index.bounds(column)
+            low, high = float(math.floor(low)), float(math.ceil(high))
+            cohort['ranges'][column] = st.slider(column, low, high, (low, high), step=1.0)
+
+    with section('cohort', rows=len(data)):
+        rows = index.select(cohort)
+    if rows is not None:
+        if len(rows) == 0:
+            st.warning('No patients match the selected cohort.')
+            st.stop()
+        data = take_rows(data, rows, cohort)
+        data_fingerprint = fingerprint(data)
+        # The running incremental aggregates cover every patient, not the cohort
+        summary = None
+        st.sidebar.caption(f'{len(data)} patients: {describe_cohort(cohort, index)}')
+
+# Resolved here, in the script thread, because background jobs use it as well
+aggregates = aggregate_cache()
+
+def cached(name, compute):
+    # Aggregates are only recomputed when the dataset changes, not on every widget rerun
+    return aggregates.get_or_compute(data_fingerprint, name, compute)
+
+# Jobs this rerun asked for; whatever the session asked for before and no longer shows is released
+job_owner = st.session_state.setdefault('job_owner', uuid.uuid4().hex)
+job_keys, waiting = [], []
+# The rerun the progress fragment triggers shows the errors of failed jobs; any other rerun
+# (an interaction of the user) retries them
+retry_failed = not st.session_state.pop('job_rerun', False)
+
+def submit(name, compute):
+    # Anything that finishes within a few milliseconds (a cache hit) is shown on this run
+    key = (data_fingerprint, name)
+    job_keys.append(key)
+    job = scheduler().submit(key, compute, job_owner, retry=retry_failed)
+    if not job.wait(0.02):
+        waiting.append(job)
+    return job
+
+def failed(job):
+    # Shows a failed job's error where its output would have been
+    error = job.error()
+    if error is not None:
+        st.error(f'{type(error).__name__}: {error}')
+    return error is not None
+
+def background(name, compute):
+    # compute()'s result, or None while a worker computes it (or after it failed)
+    job = submit(name, compute)
+    return job.result() if job.done() and not failed(job) else None
+
+def histogram(column, bins=20):
+    if summary is not None:
+        return summary.histogram(column)
+    return cached(f'histogram:{column}:{bins}', lambda: np.histogram(data[column], bins=bins))
+
+def box_stats(column):
+    # Five-number summaries and a capped outlier sample per stroke group
+    if streaming:
+        return summary.box_stats(column)
+    return cached(f'box_stats:{column}:{MAX_FLIERS}', lambda: grouped_box_stats(data, column, max_fliers=MAX_FLIERS))
+
+def partial_summary():
+    # Partitions the frame across the worker pool and merges the partial aggregates
+    return cached('parallel_summary', lambda: aggregator().summarize_frame(data))
+
+def describe_table():
+    if summary is not None:
+        return cached('describe', summary.describe)
+    if WORKERS > 1:
+        return cached('describe', lambda: partial_summary().describe())
+    return cached('describe', data.describe)
+
+def correlation_engine(method='pearson'):
+    # Summaries only carry cross-products, so Spearman needs the in-memory frame
+    if streaming:
+        return cached('correlation_engine', lambda: CorrelationEngine.from_comoments(summary.comoments))
+    if summary is not None:
+        # Incremental mode keeps its engine up to date as rows arrive
+        return snapshot.correlation
+    if WORKERS > 1:
+        return cached('correlation_engine', lambda: CorrelationEngine.from_comoments(partial_summary().comoments))
+    if method == 'spearman':
+        # The rank cache is only built once Spearman is selected
+        return cached('correlation_engine:ranks', lambda: CorrelationEngine(keep_ranks=True).append(data))
+    return cached('correlation_engine', lambda: CorrelationEngine().append(data))
+
+def spearman_available():
+    # Mirrors correlation_engine(): only engines built from the rows keep the ranks
+    return not streaming and (summary is not None or WORKERS == 1)
+
+def correlation_matrix(method='pearson'):
+    return cached(f'corr:{method}', lambda: correlation_engine(method).matrix(method))
+
+def correlation_pvalues(method='pearson'):
+    return cached(f'corr_pvalues:{method}', lambda: correlation_engine(method).pvalues(method))
+
+def stroke_table():
+    # One pass over the frame for every pie chart breakdown
+    if summary is not None:
+        return cached('stroke_crosstab', summary.stroke_counts.table)
+    if WORKERS > 1:
+        return cached('stroke_crosstab', lambda: partial_summary().stroke_counts.table())
+    return cached('stroke_crosstab', lambda: stroke_crosstab(data, FACTORS + ['age_group'], derived={'age_group': age_groups(data)}))
+
+def stroke_intervals():
+    # Resampled from the crosstab counts, so streaming and incremental modes get them too
+    return cached(f'stroke_intervals:{BOOTSTRAP_RESAMPLES}:{BOOTSTRAP_SEED}',
+                  lambda: stroke_rate_intervals(stroke_table(), BOOTSTRAP_RESAMPLES, BOOTSTRAP_SEED))
+
+n_rows = summary.rows if streaming else len(data)
+
+def render_figure(chart_id, build, figsize=None):
+    # The rendered image bytes; the figure is only built on a cache miss
+    with section(f'render:{chart_id}'):
+        return figures.get_or_render(chart_id, data_fingerprint, build, figsize, FIGURE_THEME, FIGURE_FORMAT)
+
+def render_plotly(chart_id, build_plotly):
+    # build_plotly(detail) gets coarser with detail until the payload fits the budget
+    with section(f'render:{chart_id}:plotly'):
+        return cached(f'plotly:{chart_id}:{PLOTLY_PAYLOAD_BUDGET}', lambda: plotly_charts.within_budget(build_plotly, PLOTLY_PAYLOAD_BUDGET))
+
+def show_chart(chart_id, build, build_plotly, figsize=None):
+    # Rendered by a background worker, together with the aggregates the builders ask for;
+    # until it is ready the chart's place holds a note and the page shows progress
+    if renderer == 'plotly':
+        job = submit(f'plotly:{chart_id}', lambda: render_plotly(chart_id, build_plotly))
+    else:
+        job = submit(f'render:{chart_id}:{figsize}', lambda: render_figure(chart_id, build, figsize))
+    if not job.done():
+        st.info('Rendering in the background...')
+    elif failed(job):
+        return
+    elif renderer == 'plotly':
+        fig, size = job.result()
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        image = job.result()
+        st.image(image.decode() if FIGURE_FORMAT == 'svg' else image, use_column_width=True)
 
 st.title('Stroke Prediction Dataset Exploration')
 
-# Introduction Section
-st.header('Introduction')
-st.write("""
+# Introduction Section, collapsed so the chart is the first thing in view
+with st.expander('Introduction and purpose of exploration'):
+    st.header('Introduction')
+    st.write("""
 This application presents an exploration of the Stroke Prediction Dataset from Kaggle. 
 The dataset includes various health-related parameters, such as age, glucose levels, and BMI, 
 to predict whether a patient is likely to have a stroke. The purpose of this exploration is 
 to uncover trends and relationships within the data that may provide insights into stroke prediction.
 """)
 
-st.header('Purpose of Exploration')
-st.write("""
+    st.header('Purpose of Exploration')
+    st.write("""
 The purpose of the exploration of the Stroke Prediction Dataset from Kaggle is to delve into the relationships 
          and trends among various health-related parameters, such as age, glucose levels, BMI, hypertension, and 
          heart disease, to enhance our understanding and predictive capabilities regarding stroke occurrence. 
@@ -44,34 +313,45 @@ The purpose of the exploration of the Stroke Prediction Dataset from Kaggle is t
          of strokes in vulnerable populations.
          """)
 
-# Sidebar for navigation
-st.sidebar.header('Chart Selection')
-chart_type = st.sidebar.selectbox(
-    "Select the chart you want to view",
-    ("Distributions of Age, Glucose, and BMI", "Box Plots", "Pie Charts", "Correlation Matrix")
-)
-
 if st.checkbox('Show raw data'):
-    st.write(data.head())
-
-# Descriptive statistics
+    st.write(clean(read_csv_typed(DATA_PATH, nrows=1000)).head() if streaming else data.head())
+
+# Missing and implausible values in the CSV, before the missing value policy was applied
+if not streaming and st.toggle('Show data quality'):
+    with section('quality'):
+        profile = quality_profile(dataset_fingerprint)
+        # The incremental store folds each delta with dropna, whatever the configured policy
+        policy = 'drop' if INCREMENTAL else MISSING_POLICY
+        st.caption(f"{profile['rows']} rows in the CSV, {profile['complete_rows']} without missing values; "
+                   f"{len(dataset)} kept with the '{policy}' missing value policy.")
+        st.dataframe(column_table(profile))
+        st.dataframe(category_table(profile))
+
+# Descriptive statistics, only computed while the toggle is on
 st.subheader('Descriptive Statistics')
-st.write(data.describe())
+if st.toggle('Show descriptive statistics'):
+    with section('statistics', rows=n_rows):
+        st.write(describe_table())
 
 # Visualizations Section
 st.header('Visualizations')
 
+# Plotting libraries load here, after the text above has been sent to the browser, and only
+# the one this session renders with; seaborn only inside the builders that draw with it
+with section('import'):
+    if renderer == 'plotly':
+        import plotly_charts
+    else:
+        import charts
+        figures = figure_cache()
+
+chart_span = REGISTRY.start(f'chart:{chart_type}', rows=n_rows)
+# Filled in below the view code, once it is known which of its jobs are still running
+progress_area = st.container()
+
 # Age, Glucose, BMI Histograms
 if chart_type == "Distributions of Age, Glucose, and BMI":
     st.subheader('Distributions of Age, Average Glucose Level, and BMI')
-    fig, ax = plt.subplots(1, 3, figsize=(15, 5))
-
-    # Age Distribution
-    ax[0].hist(data['age'], bins=20, color='skyblue', edgecolor='black')
-    ax[0].set_title('Age Distribution')
-    ax[0].set_xlabel('Age')
-    ax[0].set_ylabel('Frequency')
-
     st.write("""
     **Insights**:\n
     Age Distribution:
@@ -82,12 +362,6 @@ if chart_type == "Distributions of Age, Glucose, and BMI":
     a key demographic for analyzing stroke risk, reflecting known epidemiological data that stroke risk increases with age.
     """)
 
-    # Glucose Level Distribution
-    ax[1].hist(data['avg_glucose_level'], bins=20, color='lightgreen', edgecolor='black')
-    ax[1].set_title('Average Glucose Level Distribution')
-    ax[1].set_xlabel('Avg Glucose Level')
-    ax[1].set_ylabel('Frequency')
-
     st.write(""" 
     Average Glucose Level Distribution:
 
@@ -97,12 +371,6 @@ if chart_type == "Distributions of Age, Glucose, and BMI":
     factors for stroke.
     """)
 
-    # BMI Distribution
-    ax[2].hist(data['bmi'], bins=20, color='salmon', edgecolor='black')
-    ax[2].set_title('BMI Distribution')
-    ax[2].set_xlabel('BMI')
-    ax[2].set_ylabel('Frequency')
-
     st.write("""
     BMI Distribution:
 
@@ -110,31 +378,20 @@ if chart_type == "Distributions of Age, Glucose, and BMI":
     categorizing this peak within the overweight classification. The tail extending towards higher BMI values 
     indicates the presence of a significant number of obese individuals, which is another important stroke risk factor.
              """)
-    st.pyplot(fig)
+    histograms = lambda: {column: histogram(column) for column, *_ in MEASURES}
+    show_chart('distributions', lambda figsize: charts.distributions(histograms(), figsize),
+               lambda detail: plotly_charts.distributions(histograms(), detail), (15, 5))
 
 # Box Plots for Age, Average Glucose Level, and BMI
 elif chart_type == "Box Plots":
     st.subheader('Box Plots of Age, Average Glucose Level, and BMI by Stroke Status')
-    filtered_data = data[['age', 'avg_glucose_level', 'bmi', 'stroke']]
-
-    fig, ax = plt.subplots(1, 3, figsize=(15, 5))
-
-    # Age Box Plot
-    sns.boxplot(x='stroke', y='age', data=filtered_data, palette="coolwarm", ax=ax[0])
-    ax[0].set_title('Age Box Plot')
-    ax[0].set_ylabel('Age')
-
-    # Average Glucose Level Box Plot
-    sns.boxplot(x='stroke', y='avg_glucose_level', data=filtered_data, palette="coolwarm", ax=ax[1])
-    ax[1].set_title('Average Glucose Level Box Plot')
-    ax[1].set_ylabel('Avg Glucose Level')
-
-    # BMI Box Plot
-    sns.boxplot(x='stroke', y='bmi', data=filtered_data, palette="coolwarm", ax=ax[2])
-    ax[2].set_title('BMI Box Plot')
-    ax[2].set_ylabel('BMI')
-
-    st.pyplot(fig)
+    # Large frames are drawn from summaries, so render cost depends on groups, not rows
+    summaries = lambda: {column: box_stats(column) for column, *_ in MEASURES}
+    if streaming or len(data) > RAW_RENDER_MAX_ROWS:
+        build = lambda figsize: charts.box_plots_from_stats(summaries(), figsize)
+    else:
+        build = lambda figsize: charts.box_plots(data, figsize)
+    show_chart('box_plots', build, lambda detail: plotly_charts.box_plots(summaries(), detail), (15, 5))
 
     st.write(""" 
     **Insights**\n
@@ -154,14 +411,18 @@ elif chart_type == "Box Plots":
 # Correlation Heatmap
 elif chart_type == "Correlation Matrix":
     st.subheader('Correlation Matrix')
-    numeric_data = data.select_dtypes(include='number').drop(columns=['id'])
-
-    # Compute correlation matrix
-    correlation_matrix = numeric_data.corr()
-
-    fig, ax = plt.subplots(figsize=(10, 8))
-    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', ax=ax)
-    st.pyplot(fig)
+    methods = ('pearson', 'spearman') if spearman_available() else ('pearson',)
+    method = st.radio('Method', methods, format_func=str.capitalize, horizontal=True, key='correlation_method')
+    show_chart(f'correlation_heatmap:{method}', lambda figsize: charts.correlation_heatmap(correlation_matrix(method), figsize),
+               lambda detail: plotly_charts.correlation_heatmap(correlation_matrix(method), detail), (10, 8))
+    if method == 'pearson':
+        st.caption('Pairs of 0/1 flags (hypertension, heart disease, stroke) are phi coefficients and flag/measure '
+                   'pairs are point-biserial correlations; both equal Pearson\'s r on the 0/1 codes.')
+    if st.checkbox('Show p-values'):
+        # Two-sided tests of zero correlation; phi pairs use the 2x2 chi-square test
+        pvalues = background(f'corr_pvalues:{method}', lambda: correlation_pvalues(method))
+        if pvalues is not None:
+            st.dataframe(pvalues.style.format('{:.2e}', na_rep=''))
     st.write(""" 
     The correlation matrix provided visualizes the relationships between various health-related variables, 
              indicating several notable associations. Age shows moderate positive correlations with stroke, 
@@ -178,28 +439,16 @@ elif chart_type == "Correlation Matrix":
 
 # Pie Charts for Worktype, Residence Type, and Age
 elif chart_type == "Pie Charts":
+    # All pies draw from one stroke crosstab, computed by whichever render job asks for it first
+    pie_counts = lambda factor: factor_table(stroke_table(), factor)['total']
+
     st.subheader('Pie Charts for Worktype, Residence Type, and Age')
 
     # Worktype Pie Chart
-    worktype_counts = data['work_type'].value_counts(dropna=False)
+    worktype_counts = lambda: pie_counts('work_type').sort_values(ascending=False)
 
-    fig1, ax1 = plt.subplots()
-    wedges, texts, autotexts = ax1.pie(worktype_counts, autopct='%1.1f%%', startangle=90, colors=sns.color_palette("pastel"))
-
-    # Set title for the pie chart
-    ax1.set_title('Work Type Distribution')
-
-    # Improve legibility of autopct labels
-    plt.setp(autotexts, size=8, weight="bold", color="white")  # Adjust the color to white for better visibility on pastel colors
-
-    # Create a legend with labels placed in a similar manner to your example
-    ax1.legend(wedges, [f'{label}, {prop*100:.1f}%' for label, prop in zip(worktype_counts.index, worktype_counts/worktype_counts.sum())],
-            title="Work Type",
-            loc="center left",
-            bbox_to_anchor=(1, 0, 0.5, 1))
-
-    plt.tight_layout()  # Adjust layout to make room for the legend
-    st.pyplot(fig1)
+    show_chart('pie:work_type', lambda: charts.distribution_pie(worktype_counts(), 'Work Type Distribution', legend_title="Work Type"),
+               lambda detail: plotly_charts.distribution_pie(worktype_counts(), 'Work Type Distribution', detail))
 
     st.write("""
     **Insights**: 
@@ -210,11 +459,9 @@ elif chart_type == "Pie Charts":
     """)
 
     # Residence Type Pie Chart
-    residence_counts = data['Residence_type'].value_counts(dropna=False)
-    fig2, ax2 = plt.subplots()
-    ax2.pie(residence_counts, labels=residence_counts.index, autopct='%1.1f%%', startangle=90, colors=sns.color_palette("pastel"))
-    ax2.set_title('Residence Type Distribution')
-    st.pyplot(fig2)
+    residence_counts = lambda: pie_counts('Residence_type').sort_values(ascending=False)
+    show_chart('pie:Residence_type', lambda: charts.distribution_pie(residence_counts(), 'Residence Type Distribution'),
+               lambda detail: plotly_charts.distribution_pie(residence_counts(), 'Residence Type Distribution', detail))
     st.write("""
     **Insights**: 
     This pie chart displays the proportion of participants living in urban or rural areas. This distinction is crucial, as 
@@ -222,27 +469,11 @@ elif chart_type == "Pie Charts":
     uncover whether living in a particular type of residence is correlated with an increased risk of stroke.
     """)
 
-    # Define age bins
-    age_bins = pd.cut(data['age'], bins=[0, 18, 35, 50, 65, 80, 100])
-    age_group_counts = age_bins.value_counts(sort=False)
-
-    fig3, ax3 = plt.subplots()
-    wedges, texts, autotexts = ax3.pie(age_group_counts, autopct='%1.1f%%', startangle=90, colors=sns.color_palette("pastel"))
-
-    # Set title for the pie chart
-    ax3.set_title('Age Group Distribution')
+    # Age groups keep their bin order
+    age_group_counts = lambda: pie_counts('age_group')
 
-    # Improve legibility of autopct labels
-    plt.setp(autotexts, size=8, weight="bold", color="white")  # Adjust the color to white for better visibility on pastel colors
-
-    # Create a legend with labels and their respective percentages
-    ax3.legend(wedges, [f'{label}, {prop*100:.1f}%' for label, prop in zip(age_group_counts.index, age_group_counts/age_group_counts.sum())],
-            title="Age Groups",
-            loc="center left",
-            bbox_to_anchor=(1, 0, 0.5, 1))
-
-    plt.tight_layout()  # Adjust layout to make room for the legend
-    st.pyplot(fig3)
+    show_chart('pie:age_group', lambda: charts.distribution_pie(age_group_counts(), 'Age Group Distribution', legend_title="Age Groups"),
+               lambda detail: plotly_charts.distribution_pie(age_group_counts(), 'Age Group Distribution', detail))
     st.write("""
     **Insights**: 
     The Age Group pie chart segments the dataset into age groups, such as children, young adults, middle-aged, and older adults. 
@@ -250,292 +481,67 @@ elif chart_type == "Pie Charts":
     It can aid in determining if strokes are more common in older populations, as expected, or if any younger age groups show unexpected trends.
     """)
 
-    #Stroke Distribution for Individuals Living in Urban Areas and Rural Areas
-    # Calculate stroke and non-stroke counts for urban and rural residents
-    # Calculate stroke and non-stroke counts for urban and rural residents
-    st.subheader('Stroke Distribution for Individuals Living in Urban Areas and Rural Areas')
-    urban_stroke_count = data[(data['stroke'] == 1) & (data['Residence_type'] == 'Urban')].shape[0]
-    urban_no_stroke_count = data[(data['stroke'] == 0) & (data['Residence_type'] == 'Urban')].shape[0]
-
-    rural_stroke_count = data[(data['stroke'] == 1) & (data['Residence_type'] == 'Rural')].shape[0]
-    rural_no_stroke_count = data[(data['stroke'] == 0) & (data['Residence_type'] == 'Rural')].shape[0]
-    # Calculate the total counts for urban and rural
-    total_urban = urban_stroke_count + urban_no_stroke_count
-    total_rural = rural_stroke_count + rural_no_stroke_count
-
-    # Calculate percentages for urban and rural areas
-    urban_stroke_percent = (urban_stroke_count / total_urban) * 100
-    urban_no_stroke_percent = (urban_no_stroke_count / total_urban) * 100
-
-    rural_stroke_percent = (rural_stroke_count / total_rural) * 100
-    rural_no_stroke_percent = (rural_no_stroke_count / total_rural) * 100
-
-    # Prepare data for pie charts
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#a7bed3', '#dab894']
-
-    # Create subplots for the two pie charts
-    fig, axes = plt.subplots(1, 2, figsize=(8, 15))
-
-    # Pie chart for individuals living in urban areas
-    axes[0].pie([urban_stroke_percent, urban_no_stroke_percent], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Stroke Distribution for Individuals Living in Urban Areas\n\n')
-
-    # Pie chart for individuals living in rural areas
-    axes[1].pie([rural_stroke_percent, rural_no_stroke_percent], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Stroke Distribution for Individuals Living in Rural Areas')
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
-
-    # Hypertension and Stroke Pie Charts
-    # Prepare data for pie charts
-    st.subheader('Pie Chart for Individuals with Hypertension and Stroke')
-    hyper_stroke_counts = data.groupby(['hypertension', 'stroke']).size().unstack()
-
-    # Calculate percentages for visualization
-    hyper_stroke_percentages = hyper_stroke_counts.div(hyper_stroke_counts.sum(axis=1), axis=0) * 100
-
-    # Calculate the counts of stroke and no-stroke for each hypertension status
-    stroke_yes = hyper_stroke_counts.loc[1, 1]
-    no_stroke_yes = hyper_stroke_counts.loc[1, 0]
-    stroke_no = hyper_stroke_counts.loc[0, 1]
-    no_stroke_no = hyper_stroke_counts.loc[0, 0]
-
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#f1ffc4', '#ffcaaf']
+    # Stroke / no-stroke pies, one figure per factor, each followed by its stroke rates
+    intervals = background('stroke_intervals', stroke_intervals)
+    for subheader, factor, panels, colors, figsize in STROKE_PIES:
+        st.subheader(subheader)
+        # The builders run later on a worker thread, so they bind this factor's settings now
+        show_chart(f'stroke_pies:{factor}',
+                   lambda figsize, args=(factor, panels, colors): charts.stroke_pies(stroke_table(), *args, figsize),
+                   lambda detail, args=(factor, panels, colors): plotly_charts.stroke_pies(stroke_table(), *args, detail),
+                   figsize)
+        if intervals is not None:
+            st.dataframe(interval_table(intervals, factor, panels), hide_index=True)
+    st.caption(f'Stroke rates with {CONFIDENCE:.0%} Wilson score and percentile bootstrap ({BOOTSTRAP_RESAMPLES} '
+               'resamples) intervals. A bootstrap cannot resample strokes a group never had, so it is n/a for '
+               'groups with no strokes (or only strokes); for those and groups with very few strokes the Wilson '
+               'interval is the one to read.')
+
+# Switching chart_type (or renderer, or cohort) leaves the previous view's jobs without this
+# session; queued ones nobody else waits for are cancelled
+scheduler().release(job_owner, keep=job_keys)
+if waiting:
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def job_progress():
+        finished = sum(job.done() for job in waiting)
+        if finished == len(waiting):
+            # Everything this view waited for is ready (or failed): rerun the page to show it
+            st.session_state['job_rerun'] = True
+            st.rerun()
+        st.progress(finished / len(waiting), text=f'Preparing {chart_type}: {finished} of {len(waiting)} ready')
+
+    with progress_area:
+        job_progress()
+chart_span.stop()
+
+# Single-patient risk estimate; the models are only loaded once the form is submitted
+if not streaming:
+    st.header('Stroke Risk Estimate')
+    with st.form('risk_estimate'):
+        left, right = st.columns(2)
+        patient = {
+            'gender': left.selectbox('Gender', CATEGORIES['gender']),
+            'age': left.number_input('Age', 0.0, 120.0, 50.0),
+            'hypertension': int(left.checkbox('Hypertension')),
+            'heart_disease': int(left.checkbox('Heart disease')),
+            'ever_married': left.selectbox('Ever married', CATEGORIES['ever_married'], index=1),
+            'work_type': right.selectbox('Work type', CATEGORIES['work_type'], index=2),
+            'Residence_type': right.selectbox('Residence type', CATEGORIES['Residence_type']),
+            'avg_glucose_level': right.number_input('Average glucose level', 40.0, 400.0, 100.0),
+            'bmi': right.number_input('BMI', 10.0, 100.0, 28.0),
+            'smoking_status': right.selectbox('Smoking status', CATEGORIES['smoking_status'], index=1),
+        }
+        submitted = st.form_submit_button('Estimate risk')
+    if submitted:
+        with section('model', rows=len(dataset)):
+            risk = risk_model(dataset_fingerprint, dataset)
+            scores = risk.score(pd.DataFrame([patient])).iloc[0]
+        for column, (name, probability) in zip(st.columns(len(scores)), scores.items()):
+            column.metric(f'{name.capitalize()} model', f'{probability:.1%}',
+                          help=f"AUC on held-out patients: {risk.metrics[f'{name}_auc']:.3f}")
+        st.caption(f"Estimated probability of stroke. {risk.metrics['stroke_rate']:.1%} of the "
+                   f"{risk.metrics['rows']} patients in the dataset had a stroke.")
 
-    # Create subplots for the two pie charts
-    fig, axes = plt.subplots(1, 2, figsize=(8, 15))
-
-    # Pie chart for individuals with hypertension
-    axes[0].pie([stroke_yes, no_stroke_yes], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Stroke Distribution for Hypertensive Individuals')
-
-    # Pie chart for individuals without hypertension
-    axes[1].pie([stroke_no, no_stroke_no], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Stroke Distribution for Non-Hypertensive Individuals')
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
-
-    #Stroke Distribution for individuals with unhealthy and healthy heart
-        # Prepare data for pie charts
-    st.subheader('Stroke Distribution for individuals with unhealthy and healthy heart')
-    hyper_stroke_counts = data.groupby(['heart_disease', 'stroke']).size().unstack()
-
-    # Calculate percentages for visualization
-    hyper_stroke_percentages = hyper_stroke_counts.div(hyper_stroke_counts.sum(axis=1), axis=0) * 100
-
-    # Calculate the counts of stroke and no-stroke for each heart disease status
-    stroke_yes = hyper_stroke_counts.loc[1, 1]
-    no_stroke_yes = hyper_stroke_counts.loc[1, 0]
-    stroke_no = hyper_stroke_counts.loc[0, 1]
-    no_stroke_no = hyper_stroke_counts.loc[0, 0]
-
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#d0d0fe', '#f9deff']
-
-    # Create subplots for the two pie charts
-    fig, axes = plt.subplots(1, 2, figsize=(8, 15))
-
-    # Pie chart for individuals with heart disease
-    axes[0].pie([stroke_yes, no_stroke_yes], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Stroke Distribution for individuals with unhealthy heart\n\n')
-
-    # Pie chart for individuals without heart disease
-    axes[1].pie([stroke_no, no_stroke_no], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Stroke Distribution for individuals with healthy heart')
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
-
-    #Stroke Distribution for Female and Male Individuals
-    # Stroke counts for each gender
-    st.subheader('Stroke Distribution for Female and Male Individuals')
-    stroke_female = data[data['gender'] == 'Female']['stroke'].sum()
-    no_stroke_female = data[data['gender'] == 'Female']['stroke'].count() - stroke_female
-
-    stroke_male = data[data['gender'] == 'Male']['stroke'].sum()
-    no_stroke_male = data[data['gender'] == 'Male']['stroke'].count() - stroke_male
-
-
-    # Labels and colors
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#fb6f92', '#f6d7e8']
-
-    # Create subplots for pie charts by gender
-    fig, axes = plt.subplots(1, 2, figsize=(8, 15))
-
-    # Pie chart for Female individuals
-    axes[0].pie([stroke_female, no_stroke_female], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Stroke Distribution for Female Individuals')
-
-    # Pie chart for Male individuals
-    axes[1].pie([stroke_male, no_stroke_male], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Stroke Distribution for Male Individuals')
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
-
-    #Stroke Distribution for individuals for each worktype
-    # Calculate stroke and non-stroke counts for each work type
-    st.subheader('Stroke Distribution for Individuals for Each Work Type')
-    govt_stroke_count = data[(data['stroke'] == 1) & (data['work_type'] == 'Govt_job')].shape[0]
-    govt_no_stroke_count = data[(data['stroke'] == 0) & (data['work_type'] == 'Govt_job')].shape[0]
-
-    private_stroke_count = data[(data['stroke'] == 1) & (data['work_type'] == 'Private')].shape[0]
-    private_no_stroke_count = data[(data['stroke'] == 0) & (data['work_type'] == 'Private')].shape[0]
-
-    self_employed_stroke_count = data[(data['stroke'] == 1) & (data['work_type'] == 'Self-employed')].shape[0]
-    self_employed_no_stroke_count = data[(data['stroke'] == 0) & (data['work_type'] == 'Self-employed')].shape[0]
-
-    children_stroke_count = data[(data['stroke'] == 1) & (data['work_type'] == 'children')].shape[0]
-    children_no_stroke_count = data[(data['stroke'] == 0) & (data['work_type'] == 'children')].shape[0]
-
-    never_worked_stroke_count = data[(data['stroke'] == 1) & (data['work_type'] == 'Never_worked')].shape[0]
-    never_worked_no_stroke_count = data[(data['stroke'] == 0) & (data['work_type'] == 'Never_worked')].shape[0]
-    # Total counts for each work type
-    total_govt = govt_stroke_count + govt_no_stroke_count
-    total_private = private_stroke_count + private_no_stroke_count
-    total_self_employed = self_employed_stroke_count + self_employed_no_stroke_count
-    total_children = children_stroke_count + children_no_stroke_count
-    total_never_worked = never_worked_stroke_count + never_worked_no_stroke_count
-
-    # Calculate percentages
-    govt_percentages = [govt_stroke_count / total_govt * 100, govt_no_stroke_count / total_govt * 100]
-    private_percentages = [private_stroke_count / total_private * 100, private_no_stroke_count / total_private * 100]
-    self_employed_percentages = [self_employed_stroke_count / total_self_employed * 100, self_employed_no_stroke_count / total_self_employed * 100]
-    children_percentages = [children_stroke_count / total_children * 100, children_no_stroke_count / total_children * 100]
-    never_worked_percentages = [never_worked_stroke_count / total_never_worked * 100, never_worked_no_stroke_count / total_never_worked * 100]
-
-    # Prepare data for pie charts
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#c7ceea', '#f28ece']
-
-    # Create subplots for the pie charts
-    fig, axes = plt.subplots(1, 5, figsize=(12, 6))
-
-    # Pie chart for each work type
-    axes[0].pie(govt_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Govt Job')
-
-    axes[1].pie(private_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Private Job')
-
-    axes[2].pie(self_employed_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[2].set_title('Self-employed')
-
-    axes[3].pie(children_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[3].set_title('Children')
-
-    axes[4].pie(never_worked_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[4].set_title('Never Worked')
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
-
-
-    #Stroke Distribution for individuals with different smoking status
-    # Calculate stroke and non-stroke counts for each smoking status
-    # Calculate stroke and non-stroke counts for each smoking status
-    st.subheader('Stroke Distribution for Individuals with Different Smoking Status')
-    formerly_smoked_stroke_count = data[(data['stroke'] == 1) & (data['smoking_status'] == 'formerly smoked')].shape[0]
-    formerly_smoked_no_stroke_count = data[(data['stroke'] == 0) & (data['smoking_status'] == 'formerly smoked')].shape[0]
-
-    never_smoked_stroke_count = data[(data['stroke'] == 1) & (data['smoking_status'] == 'never smoked')].shape[0]
-    never_smoked_no_stroke_count = data[(data['stroke'] == 0) & (data['smoking_status'] == 'never smoked')].shape[0]
-
-    smokes_stroke_count = data[(data['stroke'] == 1) & (data['smoking_status'] == 'smokes')].shape[0]
-    smokes_no_stroke_count = data[(data['stroke'] == 0) & (data['smoking_status'] == 'smokes')].shape[0]
-
-
-
-# Total counts for each smoking status
-    total_formerly_smoked = formerly_smoked_stroke_count + formerly_smoked_no_stroke_count
-    total_never_smoked = never_smoked_stroke_count + never_smoked_no_stroke_count
-    total_smokes = smokes_stroke_count + smokes_no_stroke_count
-
-    # Calculate percentages
-    formerly_smoked_percentages = [
-        formerly_smoked_stroke_count / total_formerly_smoked * 100,
-        formerly_smoked_no_stroke_count / total_formerly_smoked * 100
-    ]
-    never_smoked_percentages = [
-        never_smoked_stroke_count / total_never_smoked * 100,
-        never_smoked_no_stroke_count / total_never_smoked * 100
-    ]
-    smokes_percentages = [
-        smokes_stroke_count / total_smokes * 100,
-        smokes_no_stroke_count / total_smokes * 100
-    ]
-
-    # Prepare data for pie charts
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#fac3a5', '#cb8d9a']
-
-    # Create subplots for the pie charts
-    fig, axes = plt.subplots(1, 3, figsize=(8,15))
-
-    # Pie chart for each smoking status
-    axes[0].pie(formerly_smoked_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Formerly Smoked')
-
-    axes[1].pie(never_smoked_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Never Smoked')
-
-    axes[2].pie(smokes_percentages, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[2].set_title('Currently Smokes')
-
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
-
-
-    # Total counts for each marital status
-    st.subheader('Stroke Distribution for Individuals according to Marital Status')
-    # Calculate stroke and non-stroke counts for each marital status
-    married_stroke_count = data[(data['stroke'] == 1) & (data['ever_married'] == 'Yes')].shape[0]
-    married_no_stroke_count = data[(data['stroke'] == 0) & (data['ever_married'] == 'Yes')].shape[0]
-
-    not_married_stroke_count = data[(data['stroke'] == 1) & (data['ever_married'] == 'No')].shape[0]
-    not_married_no_stroke_count = data[(data['stroke'] == 0) & (data['ever_married'] == 'No')].shape[0]
-
-    # Calculate total counts for both groups
-    total_married = married_stroke_count + married_no_stroke_count
-    total_not_married = not_married_stroke_count + not_married_no_stroke_count
-
-    # Calculate percentages for married and not married individuals
-    married_stroke_percent = (married_stroke_count / total_married) * 100
-    married_no_stroke_percent = (married_no_stroke_count / total_married) * 100
-
-    not_married_stroke_percent = (not_married_stroke_count / total_not_married) * 100
-    not_married_no_stroke_percent = (not_married_no_stroke_count / total_not_married) * 100
-
-    # Prepare data for pie charts
-    labels = ['Stroke', 'No Stroke']
-    colors = ['#f1ffc4', '#ffcaaf']
-
-    # Create subplots for the two pie charts
-    fig, axes = plt.subplots(1, 2, figsize=(8,15))
-
-    # Pie chart for individuals who have ever been married
-    axes[0].pie([married_stroke_percent, married_no_stroke_percent], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[0].set_title('Stroke Distribution for Married Individuals\n')
-
-    # Pie chart for individuals who have never been married
-    axes[1].pie([not_married_stroke_percent, not_married_no_stroke_percent], labels=labels, autopct='%1.1f%%', startangle=90, colors=colors)
-    axes[1].set_title('Stroke Distribution for Not Married Individuals')
-
-    # Adjust layout
-    plt.tight_layout()
-    st.pyplot(fig)
 # Conclusion Section
 st.header('Conclusion')
 st.write("""
@@ -549,3 +555,17 @@ From the visualizations and descriptive statistics, several trends are noticeabl
     choices like smoking, are major influencers of stroke risk. However, demographic factors like gender 
     and marital status also play a role, albeit to a lesser extent.
 """)
+
+# Diagnostics: where the time of this rerun went, and p50/p95 per section in this process
+if st.sidebar.checkbox('Show diagnostics'):
+    st.sidebar.subheader('This rerun')
+    st.sidebar.dataframe(pd.DataFrame(run_records, columns=['section', 'wall_s', 'cpu_s', 'rows', 'mem_delta_mb']), hide_index=True)
+    st.sidebar.subheader('All sessions')
+    st.sidebar.dataframe(pd.DataFrame(REGISTRY.summary()), hide_index=True)
+    # The figure cache (and with it matplotlib) only exists for matplotlib sessions
+    figure_stats = figures.stats() if renderer == 'matplotlib' else 'not used by the Plotly renderer'
+    st.sidebar.caption(f'Aggregate cache: {aggregates.stats()}  \nFigure cache: {figure_stats}  \n'
+                       f'Jobs: {scheduler().stats()}')
+
+if METRICS_DIR:
+    REGISTRY.export(METRICS_DIR, run_records)
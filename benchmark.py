@@ -0,0 +1,223 @@
+"""Headless benchmark of the data and chart pipeline behind app.py.
+
+Runs every stage of the app (ingest, describe, correlation, pie chart crosstab,
+histograms, box summaries and each figure render) against the bundled CSV and
+synthetic datasets of growing size, and writes wall time, the peak and growth of
+RSS while the stage ran, and allocations per stage to a JSON file that later runs
+can be compared against:
+
+    python benchmark.py --out baseline.json
+    python benchmark.py --sizes bundled 100000 --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+import charts
+from boxstats import grouped_box_stats
+from chartspec import MEASURES, STROKE_PIES
+from correlation import CorrelationEngine
+from crosstab import FACTORS, age_groups, factor_table, stroke_crosstab
+from figcache import render
+from instrument import rss_bytes, rss_delta_mb
+from ingest import clean, load_clean, read_csv_typed
+from settings import DATA_PATH, MAX_FLIERS, RAW_RENDER_MAX_ROWS
+
+DEFAULT_SIZES = ['bundled', '100000', '1000000', '10000000']
+
+
+def write_synthetic_csv(path, rows, source=DATA_PATH, seed=0, chunk_rows=1_000_000):
+    """Write `rows` patients resampled from the bundled CSV, with jittered measures and
+    the same share of "N/A" BMI and "Unknown" smoking status, one chunk at a time."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(source, keep_default_na=False)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        chunk = base.iloc[rng.integers(len(base), size=n)].reset_index(drop=True)
+        chunk['id'] = np.arange(written, written + n) + 1
+        chunk['age'] = np.clip(pd.to_numeric(chunk['age']) + rng.normal(0, 1, n), 0.08, 100).round(2)
+        chunk['avg_glucose_level'] = np.clip(chunk['avg_glucose_level'] + rng.normal(0, 2, n), 40, 300).round(2)
+        bmi = pd.to_numeric(chunk['bmi'], errors='coerce') + rng.normal(0, 0.5, n)
+        chunk['bmi'] = np.where(bmi.isna(), 'N/A', bmi.round(1).astype(str))
+        chunk.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += n
+    return path
+
+
+class RssSampler:
+    """Peak resident set size while a stage runs, sampled on a thread.
+
+    ru_maxrss is the high-water mark of the whole process, so after the first large
+    stage it would report the same figure for every later one. Where the current RSS
+    cannot be read (no /proc) both readings are None and nothing is sampled.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        if self.start is not None:
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, rss_bytes())
+
+
+def measure(stage, repeat=3):
+    """Best-of-`repeat` wall time, then one traced run for allocations."""
+    times = []
+    with RssSampler() as rss:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = stage()
+            times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    stage()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, {
+        'wall_s': min(times),
+        'wall_s_median': float(np.median(times)),
+        # The stage's own peak, and how far it took RSS above where the stage started
+        'peak_rss_mb': None if rss.peak is None else rss.peak / 2**20,
+        'rss_delta_mb': rss_delta_mb(rss.start, rss.peak),
+        'alloc_peak_mb': peak / 2**20,
+        'alloc_retained_mb': current / 2**20,
+    }
+
+
+def run_dataset(path, cache_dir, repeat):
+    results = {}
+
+    def record(name, stage, times=repeat):
+        value, stats = measure(stage, times)
+        results[name] = stats
+        rss = ('RSS unavailable' if stats['peak_rss_mb'] is None else
+               f'{stats["peak_rss_mb"]:9.1f} MB rss  {stats["rss_delta_mb"]:+8.1f} MB')
+        print(f'  {name:<34} {stats["wall_s"] * 1000:10.1f} ms  {stats["alloc_peak_mb"]:9.1f} MB alloc  {rss}', flush=True)
+        return value
+
+    record('ingest.parse_csv', lambda: clean(read_csv_typed(path)), times=1)
+    load_clean(path, cache_dir)  # writes the snapshot the next stage reads
+    data = record('ingest.load_snapshot', lambda: load_clean(path, cache_dir))
+    results['rows'] = len(data)
+
+    record('stats.describe', data.describe)
+    # The app's correlation code path: Pearson from sufficient statistics, p-values, and the
+    # Spearman view, which also builds the rank cache
+    correlation = record('stats.correlation', lambda: CorrelationEngine().append(data).matrix())
+    engine = CorrelationEngine().append(data)
+    record('stats.correlation_pvalues', engine.pvalues)
+    record('stats.correlation_spearman', lambda: CorrelationEngine(keep_ranks=True).append(data).matrix('spearman'))
+    table = record('pie.crosstab', lambda: stroke_crosstab(data, FACTORS + ['age_group'], derived={'age_group': age_groups(data)}))
+    histograms = record('distributions.histograms', lambda: {column: np.histogram(data[column], bins=20) for column, *_ in MEASURES})
+    box_stats = record('box.summaries', lambda: {column: grouped_box_stats(data, column, max_fliers=MAX_FLIERS) for column, *_ in MEASURES})
+
+    record('render.distributions', lambda: render(lambda: charts.distributions(histograms)))
+    if len(data) <= RAW_RENDER_MAX_ROWS:
+        record('render.box_plots', lambda: render(lambda: charts.box_plots(data)))
+    else:
+        record('render.box_plots', lambda: render(lambda: charts.box_plots_from_stats(box_stats)))
+    record('render.correlation_heatmap', lambda: render(lambda: charts.correlation_heatmap(correlation)))
+    worktype_counts = factor_table(table, 'work_type')['total']
+    record('render.pie.work_type', lambda: render(lambda: charts.distribution_pie(worktype_counts, 'Work Type Distribution', legend_title='Work Type')))
+    for _, factor, panels, colors, figsize in STROKE_PIES:
+        record(f'render.stroke_pies.{factor}', lambda: render(lambda: charts.stroke_pies(table, factor, panels, colors, figsize)))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print per-stage ratios against a baseline; return the stages slower than tolerance."""
+    regressions = []
+    for dataset, stages in results['datasets'].items():
+        for stage, stats in stages.items():
+            before = baseline.get('datasets', {}).get(dataset, {}).get(stage)
+            if not isinstance(stats, dict) or not before:
+                continue
+            ratio = stats['wall_s'] / max(before['wall_s'], 1e-9)
+            flag = '  REGRESSION' if ratio > tolerance else ''
+            print(f'{dataset:>10} {stage:<34} {ratio:6.2f}x{flag}')
+            if flag:
+                regressions.append((dataset, stage, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help='"bundled" and/or synthetic row counts (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage, best is reported')
+    parser.add_argument('--out', default='benchmark.json', help='where to write the results')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='slowdown ratio that counts as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+    # seaborn deprecation notices would drown the table
+    warnings.simplefilter('ignore', FutureWarning)
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'matplotlib': matplotlib.__version__,
+        },
+        'datasets': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            if size == 'bundled':
+                path = DATA_PATH
+            else:
+                print(f'generating {int(size):,} synthetic rows', flush=True)
+                path = write_synthetic_csv(os.path.join(workdir, f'synthetic-{size}.csv'), int(size))
+            print(f'{size}:', flush=True)
+            results['datasets'][size] = run_dataset(path, os.path.join(workdir, 'cache'), args.repeat)
+            if path != DATA_PATH:
+                os.remove(path)
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.out}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
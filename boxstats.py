@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def box_summary(values, label, whis=1.5, max_fliers=200):
+    """Matplotlib bxp() statistics for one group: five-number summary plus at most
+    `max_fliers` outliers, sampled evenly across the sorted outliers on each side."""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {'label': label, 'med': np.nan, 'q1': np.nan, 'q3': np.nan,
+                'whislo': np.nan, 'whishi': np.nan, 'fliers': np.empty(0)}
+
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+    inside = values[(values >= low) & (values <= high)]
+    below, above = np.sort(values[values < low]), np.sort(values[values > high])
+
+    # Split the outlier budget between both tails in proportion to their size
+    total = len(below) + len(above)
+    if total > max_fliers:
+        below_budget = round(max_fliers * len(below) / total)
+        below = sample_sorted(below, below_budget)
+        above = sample_sorted(above, max_fliers - below_budget)
+
+    return {'label': label, 'med': med, 'q1': q1, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(),
+            'fliers': np.concatenate([below, above])}
+
+
+def sample_sorted(values, size):
+    # Evenly spaced order statistics; always keeps the most extreme value
+    if size <= 0:
+        return values[:0]
+    if len(values) <= size:
+        return values
+    return values[np.linspace(0, len(values) - 1, size).round().astype(int)]
+
+
+def grouped_box_stats(data, column, by='stroke', max_fliers=200):
+    # One summary per group (stroke 0 / 1), in group order
+    values = data[column].to_numpy()
+    groups = data[by].to_numpy()
+    return [box_summary(values[groups == group], str(group), max_fliers=max_fliers) for group in np.unique(groups)]
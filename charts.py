@@ -0,0 +1,93 @@
+import matplotlib.pyplot as plt
+
+from chartspec import MEASURES, PASTEL
+from crosstab import factor_table
+
+
+def distributions(histograms, figsize=(15, 5)):
+    # histograms maps each measure column to its (counts, bin edges)
+    fig, ax = plt.subplots(1, 3, figsize=figsize)
+    for i, (column, title, label, color) in enumerate(MEASURES):
+        counts, edges = histograms[column]
+        ax[i].hist(edges[:-1], edges, weights=counts, color=color, edgecolor='black')
+        ax[i].set_title(f'{title} Distribution')
+        ax[i].set_xlabel(label)
+        ax[i].set_ylabel('Frequency')
+    return fig
+
+
+def box_plots(data, figsize=(15, 5)):
+    import seaborn as sns
+
+    filtered_data = data[['age', 'avg_glucose_level', 'bmi', 'stroke']]
+
+    fig, ax = plt.subplots(1, 3, figsize=figsize)
+    for i, (column, title, label, _) in enumerate(MEASURES):
+        sns.boxplot(x='stroke', y=column, data=filtered_data, palette="coolwarm", ax=ax[i])
+        ax[i].set_title(f'{title} Box Plot')
+        ax[i].set_ylabel(label)
+    return fig
+
+
+def correlation_heatmap(correlation_matrix, figsize=(10, 8)):
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=figsize)
+    sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', fmt='.2f', ax=ax)
+    return fig
+
+
+def distribution_pie(counts, title, legend_title=None, figsize=None):
+    # Pie of category totals; with a legend title the labels move into a side legend
+    fig, ax = plt.subplots(figsize=figsize)
+    if legend_title is None:
+        ax.pie(counts, labels=counts.index, autopct='%1.1f%%', startangle=90, colors=PASTEL)
+        ax.set_title(title)
+        return fig
+
+    wedges, texts, autotexts = ax.pie(counts, autopct='%1.1f%%', startangle=90, colors=PASTEL)
+    ax.set_title(title)
+
+    # Improve legibility of autopct labels
+    plt.setp(autotexts, size=8, weight="bold", color="white")  # Adjust the color to white for better visibility on pastel colors
+
+    ax.legend(wedges, [f'{label}, {prop*100:.1f}%' for label, prop in zip(counts.index, counts/counts.sum())],
+            title=legend_title,
+            loc="center left",
+            bbox_to_anchor=(1, 0, 0.5, 1))
+
+    fig.tight_layout()  # Adjust layout to make room for the legend
+    return fig
+
+
+def stroke_pies(stroke_table, factor, panels, colors, figsize):
+    # Stroke / no-stroke pies, one panel per level of a factor
+    counts = factor_table(stroke_table, factor)
+    fig, axes = plt.subplots(1, len(panels), figsize=figsize)
+    for ax, (level, title) in zip(axes, panels):
+        # A cohort may have no patients at some level (0/1 flags then lack the row entirely)
+        if level not in counts.index or counts.loc[level, 'total'] == 0:
+            ax.set_title(title)
+            ax.axis('off')
+            continue
+        ax.pie(counts.loc[level, ['stroke', 'no_stroke']], labels=['Stroke', 'No Stroke'], autopct='%1.1f%%', startangle=90, colors=colors)
+        ax.set_title(title)
+
+    # Adjust layout
+    fig.tight_layout()
+    return fig
+
+
+def box_plots_from_stats(box_stats, figsize=(15, 5)):
+    # Same layout as box_plots(), drawn from precomputed per stroke group statistics
+    # seaborn's two-color "coolwarm" palette, without importing seaborn
+    colors = plt.get_cmap('coolwarm')([1 / 3, 2 / 3])
+    fig, ax = plt.subplots(1, 3, figsize=figsize)
+    for i, (column, title, label, _) in enumerate(MEASURES):
+        boxes = ax[i].bxp(box_stats[column], patch_artist=True, medianprops={'color': 'black'})
+        for patch, color in zip(boxes['boxes'], colors):
+            patch.set_facecolor(color)
+        ax[i].set_title(f'{title} Box Plot')
+        ax[i].set_xlabel('stroke')
+        ax[i].set_ylabel(label)
+    return fig
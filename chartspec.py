@@ -0,0 +1,49 @@
+# Chart layout shared by the matplotlib (charts.py) and Plotly (plotly_charts.py) builders and
+# the app. Kept free of plotting imports, so a session only loads the library it renders with
+
+# Stroke / no-stroke pie panels of the Pie Charts view:
+# (subheader, factor, [(level, panel title), ...], colors, figsize)
+STROKE_PIES = [
+    ('Stroke Distribution for Individuals Living in Urban Areas and Rural Areas', 'Residence_type', [
+        ('Urban', 'Stroke Distribution for Individuals Living in Urban Areas\n\n'),
+        ('Rural', 'Stroke Distribution for Individuals Living in Rural Areas'),
+    ], ['#a7bed3', '#dab894'], (8, 15)),
+    ('Pie Chart for Individuals with Hypertension and Stroke', 'hypertension', [
+        (1, 'Stroke Distribution for Hypertensive Individuals'),
+        (0, 'Stroke Distribution for Non-Hypertensive Individuals'),
+    ], ['#f1ffc4', '#ffcaaf'], (8, 15)),
+    ('Stroke Distribution for individuals with unhealthy and healthy heart', 'heart_disease', [
+        (1, 'Stroke Distribution for individuals with unhealthy heart\n\n'),
+        (0, 'Stroke Distribution for individuals with healthy heart'),
+    ], ['#d0d0fe', '#f9deff'], (8, 15)),
+    ('Stroke Distribution for Female and Male Individuals', 'gender', [
+        ('Female', 'Stroke Distribution for Female Individuals'),
+        ('Male', 'Stroke Distribution for Male Individuals'),
+    ], ['#fb6f92', '#f6d7e8'], (8, 15)),
+    ('Stroke Distribution for Individuals for Each Work Type', 'work_type', [
+        ('Govt_job', 'Govt Job'),
+        ('Private', 'Private Job'),
+        ('Self-employed', 'Self-employed'),
+        ('children', 'Children'),
+        ('Never_worked', 'Never Worked'),
+    ], ['#c7ceea', '#f28ece'], (12, 6)),
+    ('Stroke Distribution for Individuals with Different Smoking Status', 'smoking_status', [
+        ('formerly smoked', 'Formerly Smoked'),
+        ('never smoked', 'Never Smoked'),
+        ('smokes', 'Currently Smokes'),
+    ], ['#fac3a5', '#cb8d9a'], (8, 15)),
+    ('Stroke Distribution for Individuals according to Marital Status', 'ever_married', [
+        ('Yes', 'Stroke Distribution for Married Individuals\n'),
+        ('No', 'Stroke Distribution for Not Married Individuals'),
+    ], ['#f1ffc4', '#ffcaaf'], (8, 15)),
+]
+
+# seaborn's "pastel" palette, so the pies don't need seaborn loaded
+PASTEL = ['#a1c9f4', '#ffb482', '#8de5a1', '#ff9f9b', '#d0bbff', '#debb9b', '#fab0e4', '#cfcfcf', '#fffea3', '#b9f2f0']
+
+# (column, title, axis label, color) of the three measures shown in the Distributions and Box Plots views
+MEASURES = [
+    ('age', 'Age', 'Age', 'skyblue'),
+    ('avg_glucose_level', 'Average Glucose Level', 'Avg Glucose Level', 'lightgreen'),
+    ('bmi', 'BMI', 'BMI', 'salmon'),
+]
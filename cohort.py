@@ -0,0 +1,105 @@
+import hashlib
+import json
+
+import numpy as np
+
+from crosstab import factor_codes
+
+# Columns a cohort can be restricted on by category and by value range
+CATEGORY_COLUMNS = ['gender', 'work_type', 'Residence_type', 'smoking_status', 'ever_married', 'hypertension', 'heart_disease']
+RANGE_COLUMNS = ['age', 'avg_glucose_level', 'bmi']
+
+
+class CohortIndex:
+    """Precomputed row indexes for cohort selection over a cleaned frame.
+
+    Each category level owns a packed row bitmap and each range column a sorted
+    copy of its values with the matching row order, so selecting a cohort is a few
+    bitmap ANDs/ORs plus binary searches instead of boolean masks over the frame.
+    """
+
+    def __init__(self, data):
+        self.n = len(data)
+        self.levels = {}
+        self.bitmaps = {}
+        for column in CATEGORY_COLUMNS:
+            codes, levels = factor_codes(data[column])
+            self.levels[column] = levels
+            self.bitmaps[column] = [np.packbits(codes == i) for i in range(len(levels))]
+
+        self.sorted = {}
+        for column in RANGE_COLUMNS:
+            values = data[column].to_numpy()
+            order = np.argsort(values, kind='stable')
+            self.sorted[column] = (values[order], order)
+
+    def bounds(self, column):
+        values, _ = self.sorted[column]
+        return (float(values[0]), float(values[-1])) if self.n else (0.0, 0.0)
+
+    def category_bits(self, column, selected):
+        bits = np.zeros_like(self.bitmaps[column][0])
+        for i, level in enumerate(self.levels[column]):
+            if level in selected:
+                bits |= self.bitmaps[column][i]
+        return bits
+
+    def range_bits(self, column, low, high):
+        values, order = self.sorted[column]
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+        mask = np.zeros(self.n, dtype=bool)
+        mask[order[start:stop]] = True
+        return np.packbits(mask)
+
+    def select(self, cohort):
+        """Row positions matching the cohort, or None when the cohort does not restrict anything."""
+        bits = None
+        for column, selected in cohort.get('categories', {}).items():
+            if set(selected) >= set(self.levels[column]):
+                continue
+            part = self.category_bits(column, selected)
+            bits = part if bits is None else bits & part
+        for column, (low, high) in cohort.get('ranges', {}).items():
+            min_value, max_value = self.bounds(column)
+            if low <= min_value and high >= max_value:
+                continue
+            part = self.range_bits(column, low, high)
+            bits = part if bits is None else bits & part
+
+        if bits is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bits, count=self.n))
+
+
+def cohort_key(cohort):
+    # Stable short id of a cohort selection, used to extend the dataset fingerprint
+    payload = json.dumps(cohort, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+
+def take_rows(data, rows, cohort):
+    """The cohort's rows of `data`, fingerprinted as that cohort so it never passes for the full dataset."""
+    subset = data.take(rows).reset_index(drop=True)
+    subset.attrs = dict(data.attrs)
+    fingerprint = data.attrs.get('fingerprint')
+    if fingerprint is None:
+        # aggcache.fingerprint() hashes the subset's content instead
+        subset.attrs.pop('fingerprint', None)
+    else:
+        subset.attrs['fingerprint'] = f'{fingerprint}:{cohort_key(cohort)}'
+    return subset
+
+
+def describe_cohort(cohort, index):
+    # Human readable summary of the restrictions in effect
+    parts = []
+    for column, selected in cohort.get('categories', {}).items():
+        if not set(selected) >= set(index.levels[column]):
+            parts.append(f"{column} in {', '.join(str(level) for level in selected) or '∅'}")
+    for column, (low, high) in cohort.get('ranges', {}).items():
+        min_value, max_value = index.bounds(column)
+        if low > min_value or high < max_value:
+            parts.append(f'{column} {low:g}–{high:g}')
+    return '; '.join(parts)
+
@@ -0,0 +1 @@
+# Makes the app modules at the repository root importable from tests/
@@ -0,0 +1,154 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+from streaming import CORRELATION_COLUMNS, CoMoments
+
+BINARY_COLUMNS = ['hypertension', 'heart_disease', 'stroke']
+
+
+def betainc(a, b, x):
+    """Regularized incomplete beta I_x(a, b) by Lentz's continued fraction."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - betainc(b, a, 1.0 - x)
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    f = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            f *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return front * f
+
+
+def correlation_pvalue(r, n):
+    # Two-sided p-value of H0: rho = 0 from the t statistic with n - 2 degrees of freedom
+    df = n - 2
+    if df <= 0 or not np.isfinite(r):
+        return np.nan
+    if abs(r) >= 1:
+        return 0.0
+    t2 = r * r * df / (1 - r * r)
+    return betainc(df / 2, 0.5, df / (df + t2))
+
+
+def phi_pvalue(phi, n):
+    # Chi-square test of a 2x2 table with 1 degree of freedom: chi2 = n * phi^2
+    if not np.isfinite(phi):
+        return np.nan
+    return math.erfc(math.sqrt(n * phi * phi / 2))
+
+
+def average_ranks(values, sorted_values):
+    # 1-based ranks with ties sharing their average rank, looked up in the sorted cache
+    left = np.searchsorted(sorted_values, values, side='left')
+    right = np.searchsorted(sorted_values, values, side='right')
+    return (left + right + 1) / 2
+
+
+class CorrelationEngine:
+    """Correlation matrices kept up to date from sufficient statistics.
+
+    Pearson, point-biserial (binary vs continuous) and phi (binary vs binary) all
+    derive from n, column sums and cross-products, which `append` updates in
+    O(new rows). Spearman is Pearson on average ranks: with `keep_ranks` the engine
+    also keeps the rows and a sorted copy of each column (the rank cache), appends
+    merge into it, and the rank matrix is rebuilt lazily the next time Spearman is
+    asked for. The rank cache is several times the size of the rows themselves, so
+    it is off unless Spearman is needed.
+    """
+
+    def __init__(self, columns=CORRELATION_COLUMNS, binary=BINARY_COLUMNS, keep_ranks=False):
+        self.columns = list(columns)
+        self.binary = [column for column in self.columns if column in binary]
+        self.moments = CoMoments(self.columns)
+        self.keep_ranks = keep_ranks
+        self._chunks = []
+        self._sorted = [np.empty(0) for _ in self.columns]
+        self._spearman = None
+
+    @classmethod
+    def from_comoments(cls, comoments, binary=BINARY_COLUMNS):
+        # Pearson-family statistics only, e.g. from a streaming or parallel summary
+        engine = cls(comoments.columns, binary, keep_ranks=False)
+        engine.moments = comoments
+        return engine
+
+    def copy(self):
+        # Shares the row chunks and sorted arrays, which append only ever replaces
+        engine = copy.copy(self)
+        engine.moments = copy.deepcopy(self.moments)
+        engine._chunks = list(self._chunks)
+        engine._sorted = list(self._sorted)
+        return engine
+
+    @property
+    def n(self):
+        return self.moments.n
+
+    def append(self, frame):
+        values = frame[self.columns].to_numpy(dtype=np.float64)
+        self.moments.update(values)
+        if self.keep_ranks:
+            self._chunks.append(values)
+            for i in range(len(self.columns)):
+                new = np.sort(values[:, i])
+                self._sorted[i] = np.insert(self._sorted[i], np.searchsorted(self._sorted[i], new), new)
+            self._spearman = None
+        return self
+
+    def kinds(self):
+        # Which coefficient each cell is: on 0/1 codes all three equal Pearson's r
+        kinds = pd.DataFrame('pearson', index=self.columns, columns=self.columns)
+        for a in self.columns:
+            for b in self.columns:
+                if (a in self.binary) != (b in self.binary):
+                    kinds.loc[a, b] = 'point-biserial'
+                elif a in self.binary:
+                    kinds.loc[a, b] = 'phi'
+        return kinds
+
+    def pearson(self):
+        return self.moments.correlation()
+
+    def spearman(self):
+        if not self.keep_ranks:
+            raise ValueError('Spearman needs the rank cache; this engine was built without keep_ranks')
+        if self._spearman is None:
+            values = np.concatenate(self._chunks) if self._chunks else np.empty((0, len(self.columns)))
+            ranks = CoMoments(self.columns)
+            ranks.update(np.column_stack([average_ranks(values[:, i], self._sorted[i]) for i in range(len(self.columns))]))
+            self._spearman = ranks.correlation()
+        return self._spearman
+
+    def matrix(self, method='pearson'):
+        return self.spearman() if method == 'spearman' else self.pearson()
+
+    def pvalues(self, method='pearson'):
+        matrix = self.matrix(method)
+        kinds = self.kinds()
+        pvalues = pd.DataFrame(np.nan, index=self.columns, columns=self.columns)
+        for a in self.columns:
+            for b in self.columns:
+                if a == b:
+                    continue
+                r = matrix.loc[a, b]
+                if method == 'pearson' and kinds.loc[a, b] == 'phi':
+                    pvalues.loc[a, b] = phi_pvalue(r, self.n)
+                else:
+                    pvalues.loc[a, b] = correlation_pvalue(r, self.n)
+        return pvalues
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Categorical factors the stroke breakdowns are reported for
+FACTORS = ['Residence_type', 'hypertension', 'heart_disease', 'gender', 'work_type', 'smoking_status', 'ever_married']
+
+AGE_BINS = [0, 18, 35, 50, 65, 80, 100]
+
+
+def factor_codes(column):
+    # Categorical columns already carry integer codes; anything else is factorized once
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), list(column.cat.categories)
+    codes, levels = pd.factorize(column, sort=True)
+    return codes, list(levels)
+
+
+def stroke_crosstab(data, factors=FACTORS, target='stroke', derived=None):
+    """Stroke / no-stroke counts and rates for every level of every factor, in one tidy frame.
+
+    All factors are counted together with a single bincount over offset codes,
+    so the cost is O(n) for the whole table rather than one mask per category.
+    `derived` maps extra factor names to Series aligned with `data` (e.g. age groups).
+    """
+    derived = derived or {}
+    y = data[target].to_numpy().astype(np.int64)
+    codes, levels, offsets = [], [], [0]
+    for factor in factors:
+        c, lv = factor_codes(derived[factor] if factor in derived else data[factor])
+        codes.append(c)
+        levels.append(lv)
+        offsets.append(offsets[-1] + len(lv))
+
+    # Cell id = (factor offset + level code) * 2 + stroke flag; NA codes (-1) are dropped
+    stacked = np.stack(codes).astype(np.int64)
+    cells = (stacked + np.array(offsets[:-1])[:, None]) * 2 + y
+    cells = cells[stacked >= 0]
+    counts = np.bincount(cells, minlength=2 * offsets[-1]).reshape(-1, 2)
+
+    table = pd.DataFrame({
+        'factor': np.repeat(factors, [len(lv) for lv in levels]),
+        'level': [level for lv in levels for level in lv],
+        'no_stroke': counts[:, 0],
+        'stroke': counts[:, 1],
+    })
+    table['total'] = table['no_stroke'] + table['stroke']
+    table['rate'] = table['stroke'] / table['total'].where(table['total'] > 0)
+    return table
+
+
+def age_groups(data, bins=AGE_BINS):
+    # Age bands used by the Age Group pie chart, as a categorical Series
+    return pd.cut(data['age'], bins=bins)
+
+
+def factor_table(table, factor):
+    return table[table['factor'] == factor].set_index('level')
@@ -0,0 +1,83 @@
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+
+# Same output settings st.pyplot uses, so cached images look like the live ones
+SAVEFIG_KWARGS = {'bbox_inches': 'tight', 'dpi': 200}
+
+# st.image re-decodes and shrinks PNGs wider than this on every call; doing it once here
+# means cached bytes are served untouched
+MAX_IMAGE_WIDTH = 1460
+
+
+def fit_width(png, max_width=MAX_IMAGE_WIDTH):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(png))
+    if image.width <= max_width:
+        return png
+    image = image.resize((max_width, int(image.height * max_width / image.width)), resample=Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render(build, figsize=None, theme='default', fmt='png'):
+    """Build a figure under the given matplotlib style, return its encoded bytes and close it."""
+    with plt.style.context(theme):
+        fig = build(figsize) if figsize is not None else build()
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, **SAVEFIG_KWARGS)
+        return fit_width(buffer.getvalue()) if fmt == 'png' else buffer.getvalue()
+    finally:
+        # Free the figure right away so long sessions don't accumulate live Figures
+        plt.close(fig)
+
+
+class FigureCache:
+    """LRU cache of rendered figure bytes, bounded by total size.
+
+    Keys are (chart id, data fingerprint, figure size, theme, format); a miss
+    builds and rasterizes the figure once, later reruns are served the bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, chart_id, fingerprint, build, figsize=None, theme='default', fmt='png'):
+        key = (chart_id, fingerprint, figsize, theme, fmt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        image = render(build, figsize, theme, fmt)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = image
+                self.nbytes += len(image)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,232 @@
+import copy
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from correlation import CorrelationEngine
+from ingest import SCHEMA_VERSION, clean, file_lock, freeze, read_csv_typed, source_stem, write_atomic_json
+from instrument import section
+from parallel import RangeReader
+from settings import CACHE_DIR, DATA_PATH
+from streaming import StreamingSummary
+
+# Bytes at the start of the registry file that must not change between appends;
+# if they do, the file was rewritten rather than appended to and the store is rebuilt
+PREFIX_BYTES = 1 << 16
+
+
+def prefix_digest(path, length):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(min(length, PREFIX_BYTES))).hexdigest()
+
+
+def complete_lines_end(path, start):
+    # Offset just past the last newline, so a row that is still being written is left for later
+    size = os.path.getsize(path)
+    if size <= start:
+        return start
+    with open(path, 'rb') as f:
+        pos = size
+        while pos > start:
+            step = min(PREFIX_BYTES, pos - start)
+            f.seek(pos - step)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return pos - step + newline + 1
+            pos -= step
+    return start
+
+
+class Snapshot:
+    """One immutable version of the registry: the cleaned frame and the aggregates over it."""
+
+    def __init__(self, data, summary, correlation, version, source):
+        data.attrs['fingerprint'] = version
+        data.attrs['source'] = source
+        # Shared by every session until the next refresh replaces it
+        self.data = freeze(data)
+        self.summary = summary
+        self.correlation = correlation
+        self.version = version
+
+
+class IncrementalStore:
+    """Cleaned registry kept as Feather part files that only ever grow.
+
+    The main CSV is followed by byte offset: each refresh parses only the complete
+    lines written since the last one. Extra CSV drops matching `append_glob` are
+    read once each, keeping only rows above the `id` high-water mark. Every delta
+    goes through the same typed parse and dropna as a full load, is written as a
+    new part file and is folded into the running summary and correlation engine,
+    so a refresh costs O(new rows) apart from concatenating the in-memory frame.
+
+    Processes sharing `cache_dir` share the part files: reading and extending them
+    happens under a file lock, and a process first picks up the parts others wrote
+    before parsing anything itself.
+    """
+
+    def __init__(self, path=DATA_PATH, cache_dir=CACHE_DIR, append_glob=''):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.append_glob = append_glob
+        self.source = f'{source_stem(path)}-parts'
+        self.parts_dir = os.path.join(cache_dir, f'{self.source}-v{SCHEMA_VERSION}')
+        self.manifest_path = os.path.join(self.parts_dir, 'manifest.json')
+        # Next to the parts directory, which is emptied when the store is rebuilt
+        self.lock_path = f'{self.parts_dir}.lock'
+        self.snapshot = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Pick up new rows and return the current Snapshot; cheap when nothing changed."""
+        with self._lock:
+            stat = self._watch()
+            if stat != self._stat:
+                with file_lock(self.lock_path):
+                    if self.snapshot is None:
+                        self._open()
+                    else:
+                        self._sync()
+                    self._append_new()
+                self._stat = stat
+            return self.snapshot
+
+    def _watch(self):
+        # (size, mtime) of every watched file; the stat calls are all an unchanged refresh costs
+        paths = [self.path] + (sorted(glob.glob(self.append_glob)) if self.append_glob else [])
+        return tuple((p, os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths)
+
+    def _read_manifest(self):
+        # The manifest on disk, or None when there is none or the registry was rewritten since
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if os.path.getsize(self.path) < manifest['offset'] or \
+                    prefix_digest(self.path, manifest['offset']) != manifest['prefix_sha256']:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return manifest
+
+    def _open(self):
+        # Reuse the part files of an earlier process unless the registry was rewritten
+        manifest = self._read_manifest()
+        if manifest is None:
+            for name in os.listdir(self.parts_dir) if os.path.isdir(self.parts_dir) else []:
+                os.remove(os.path.join(self.parts_dir, name))
+            os.makedirs(self.parts_dir, exist_ok=True)
+            manifest = {'offset': 0, 'prefix_sha256': '', 'names': None, 'id_high_water': -1, 'files': [], 'parts': []}
+        self.manifest = manifest
+
+        with section('ingest.parts', rows=0) as span:
+            parts = [feather.read_feather(os.path.join(self.parts_dir, name), memory_map=True) for name in manifest['parts']]
+            data = pd.concat(parts, ignore_index=True) if parts else clean(read_csv_typed(self.path, nrows=0))
+            span.rows = len(data)
+        # The engine keeps its rank cache so Spearman follows the store as parts arrive
+        summary, engine = StreamingSummary(), CorrelationEngine(keep_ranks=True)
+        summary.update(data)
+        engine.append(data)
+        self.snapshot = Snapshot(data, summary, engine, self._version(), self.source)
+
+    def _sync(self):
+        # Parts appended by other processes since this one last looked; a manifest that
+        # does not extend ours means the store was rebuilt, so everything is reloaded
+        manifest = self._read_manifest()
+        known = self.manifest['parts']
+        if manifest is None or manifest['parts'][:len(known)] != known:
+            self._open()
+            return
+        new = manifest['parts'][len(known):]
+        self.manifest = manifest
+        if new:
+            with section('ingest.parts', rows=0) as span:
+                delta = pd.concat([feather.read_feather(os.path.join(self.parts_dir, name), memory_map=True)
+                                   for name in new], ignore_index=True)
+                span.rows = len(delta)
+            self._publish(delta)
+
+    def _read_main(self):
+        start = self.manifest['offset']
+        end = complete_lines_end(self.path, start)
+        if end <= start:
+            return None
+        if self.manifest['names'] is None:
+            with open(self.path, 'rb') as f:
+                header = f.readline()
+            self.manifest['names'] = header.decode().strip().split(',')
+            start = len(header)
+            if end <= start:
+                return None
+        reader = RangeReader(self.path, start, end)
+        try:
+            raw = read_csv_typed(reader, header=None, names=self.manifest['names'])
+        finally:
+            reader.close()
+        self.manifest['offset'] = end
+        self.manifest['prefix_sha256'] = prefix_digest(self.path, end)
+        self._raise_high_water(raw)
+        return raw
+
+    def _raise_high_water(self, raw):
+        # Raised as soon as rows are read, so a drop read in the same refresh skips them too
+        if raw['id'].notna().any():
+            self.manifest['id_high_water'] = max(self.manifest['id_high_water'], int(raw['id'].max()))
+
+    def _read_drops(self):
+        frames = []
+        for path in sorted(glob.glob(self.append_glob)) if self.append_glob else []:
+            name = os.path.abspath(path)
+            if name in self.manifest['files'] or os.path.abspath(self.path) == name:
+                continue
+            raw = read_csv_typed(path)
+            # Drops may repeat rows from earlier exports; only ids above the high-water mark are new
+            raw = raw[raw['id'] > self.manifest['id_high_water']]
+            frames.append(raw)
+            self._raise_high_water(raw)
+            self.manifest['files'].append(name)
+        return frames
+
+    def _append_new(self):
+        with section('ingest.delta') as span:
+            start = self.manifest['offset']
+            main = self._read_main()
+            raws = ([main] if main is not None else []) + self._read_drops()
+            raws = [raw for raw in raws if len(raw)]
+            if not raws:
+                write_atomic_json(self.manifest_path, self.manifest)
+                span.rows = 0
+                return
+            raw = pd.concat(raws, ignore_index=True)
+            # Named by the byte range of the registry and the drops it covers, never by position
+            name = f'part-{start:012d}-{self.manifest["offset"]:012d}-f{len(self.manifest["files"]):04d}.feather'
+            delta = clean(raw)
+            span.rows = len(delta)
+
+            tmp = os.path.join(self.parts_dir, f'{name}.{os.getpid()}.tmp')
+            feather.write_feather(delta, tmp, compression='uncompressed')
+            os.replace(tmp, os.path.join(self.parts_dir, name))
+            self.manifest['parts'].append(name)
+            write_atomic_json(self.manifest_path, self.manifest)
+        self._publish(delta)
+
+    def _publish(self, delta):
+        # Sessions may still be reading the previous snapshot, so its aggregates are
+        # copied (they are small) rather than updated in place
+        previous = self.snapshot
+        summary = copy.deepcopy(previous.summary)
+        summary.update(delta)
+        engine = previous.correlation.copy().append(delta)
+        data = pd.concat([previous.data, delta], ignore_index=True)
+        self.snapshot = Snapshot(data, summary, engine, self._version(), self.source)
+
+    def _version(self):
+        manifest = self.manifest
+        key = f'{manifest["prefix_sha256"]}:{manifest["offset"]}:{len(manifest["files"])}'
+        return hashlib.sha256(key.encode()).hexdigest()[:16] + f'-v{SCHEMA_VERSION}-p{len(manifest["parts"])}'
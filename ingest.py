@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from instrument import section
+from quality import handle_missing, profile
+from settings import CACHE_DIR, DATA_PATH, MISSING_POLICY
+
+# Bump whenever the schema or the cleaning rules change so old snapshots are ignored
+SCHEMA_VERSION = 1
+
+# Fixed category sets keep the categorical codes stable across files and chunks
+CATEGORIES = {
+    'gender': ['Female', 'Male', 'Other'],
+    'ever_married': ['No', 'Yes'],
+    'work_type': ['Govt_job', 'Never_worked', 'Private', 'Self-employed', 'children'],
+    'Residence_type': ['Rural', 'Urban'],
+    'smoking_status': ['formerly smoked', 'never smoked', 'smokes'],
+}
+
+# Explicit column types: categoricals for strings, int8 flags, float32 measures
+SCHEMA = {
+    'id': 'int32',
+    'gender': pd.CategoricalDtype(CATEGORIES['gender']),
+    'age': 'float32',
+    'hypertension': 'int8',
+    'heart_disease': 'int8',
+    'ever_married': pd.CategoricalDtype(CATEGORIES['ever_married']),
+    'work_type': pd.CategoricalDtype(CATEGORIES['work_type']),
+    'Residence_type': pd.CategoricalDtype(CATEGORIES['Residence_type']),
+    'avg_glucose_level': 'float32',
+    'bmi': 'float32',
+    'smoking_status': pd.CategoricalDtype(CATEGORIES['smoking_status']),
+    'stroke': 'int8',
+}
+
+# "N/A" is the missing BMI marker and "Unknown" means the smoking status is unavailable;
+# both are turned into NA by the parser instead of a full-frame replace afterwards
+NA_VALUES = ['N/A', 'Unknown']
+
+
+# The parser itself infers the categories: with the fixed sets above, an unseen level
+# (a new work type in a registry extract) would silently become NA and be dropped.
+# Integer columns parse as nullable Int8/Int32, so a blank flag is a missing value the
+# profile reports and the missing value policy handles, not a parse error
+NULLABLE = {'int8': 'Int8', 'int32': 'Int32'}
+PARSE_DTYPES = {column: 'category' if column in CATEGORIES else NULLABLE.get(dtype, dtype)
+                for column, dtype in SCHEMA.items()}
+
+
+def check_categories(raw):
+    """Cast the parsed categoricals to the fixed CATEGORIES, raising if any value is outside them."""
+    unknown = []
+    for column, levels in CATEGORIES.items():
+        if column not in raw:
+            continue
+        extra = [level for level in raw[column].cat.categories if level not in levels]
+        if extra:
+            counts = raw[column].value_counts()
+            unknown.append(f"{column}: {', '.join(f'{level!r} ({counts[level]} rows)' for level in extra)}")
+    if unknown:
+        raise ValueError(f"values outside ingest.CATEGORIES ({'; '.join(unknown)}); add them there and bump "
+                         "SCHEMA_VERSION to accept them")
+    return raw.astype({column: SCHEMA[column] for column in CATEGORIES if column in raw})
+
+
+def read_csv_typed(path, **kwargs):
+    reader = pd.read_csv(path, dtype=PARSE_DTYPES, na_values=NA_VALUES, **kwargs)
+    if kwargs.get('chunksize') is not None:
+        return (check_categories(chunk) for chunk in reader)
+    return check_categories(reader)
+
+
+def compact(data):
+    # Back to the SCHEMA dtypes (nullable Int8 -> int8) once no missing values are left
+    return data.astype({column: dtype for column, dtype in SCHEMA.items()
+                        if column in data and dtype in NULLABLE})
+
+
+def clean(data):
+    # Drop rows with NaN values and reset the index after dropping rows
+    return compact(data.dropna().reset_index(drop=True))
+
+
+def freeze(data):
+    """Rebuild `data` on read-only arrays, one per column, so a single copy can be shared.
+
+    Categoricals keep their small code arrays, so every column stays at 1-4 bytes per row.
+    Any in-place write raises instead of silently changing what other sessions see.
+    """
+    columns = {}
+    for column in data.columns:
+        series = data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy().copy()
+            codes.flags.writeable = False
+            columns[column] = pd.Categorical.from_codes(codes, dtype=series.dtype)
+        else:
+            values = series.to_numpy().copy()
+            values.flags.writeable = False
+            columns[column] = values
+    frozen = pd.DataFrame(columns, copy=False)
+    frozen.attrs.update(data.attrs)
+    return frozen
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(path, cache_dir=CACHE_DIR):
+    # The content hash is only recomputed when the file's size or mtime moved
+    stat = os.stat(path)
+    meta_path = os.path.join(cache_dir, os.path.basename(path) + '.json')
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+            return meta['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = file_sha256(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_atomic_json(meta_path, {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha})
+    return sha
+
+
+def write_atomic_json(path, payload):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def remove_stale(path, pattern):
+    """Delete the older versions of the cache entry `path` from its directory.
+
+    `pattern` matches the name of every version of the entry; its groups are the
+    parts that tell versions apart (source hash, schema version). Entries whose
+    groups differ from those of `path` are removed, files and directories alike.
+    Processes still mapping one keep its pages until they let go of it.
+    """
+    directory, name = os.path.split(path)
+    current = re.fullmatch(pattern, name).groups()
+    for other in os.listdir(directory or '.'):
+        match = re.fullmatch(pattern, other)
+        if match is None or match.groups() == current:
+            continue
+        try:
+            if os.path.isdir(os.path.join(directory, other)):
+                shutil.rmtree(os.path.join(directory, other))
+            else:
+                os.remove(os.path.join(directory, other))
+        except OSError:
+            # Another process removed it first, or (on Windows) still has it open
+            pass
+
+
+@contextmanager
+def file_lock(path):
+    # Advisory lock across processes sharing a cache directory (Unix only, hence the local import)
+    import fcntl
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def source_stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def snapshot_path(path, key, cache_dir=CACHE_DIR, policy='drop'):
+    suffix = '' if policy == 'drop' else f'-{policy}'
+    return os.path.join(cache_dir, f'{source_stem(path)}-{key[:16]}-v{SCHEMA_VERSION}{suffix}.feather')
+
+
+def profile_path(path, key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f'{source_stem(path)}-{key[:16]}-v{SCHEMA_VERSION}.quality.json')
+
+
+def parse_and_profile(path, key, cache_dir=CACHE_DIR):
+    """Typed parse of the whole CSV plus its data-quality profile, which is cached as JSON."""
+    with section('ingest.parse') as span:
+        raw = read_csv_typed(path)
+        span.rows = len(raw)
+    with section('ingest.profile', rows=len(raw)):
+        report = profile(raw)
+    os.makedirs(cache_dir, exist_ok=True)
+    target = profile_path(path, key, cache_dir)
+    write_atomic_json(target, report)
+    remove_stale(target, re.escape(source_stem(path)) + r'-([0-9a-f]{16})-v(\d+)\.quality\.json')
+    return raw, report
+
+
+def load_profile(path=DATA_PATH, cache_dir=CACHE_DIR):
+    """Data-quality profile of the CSV as it was parsed, before missing values were handled."""
+    key = source_key(path, cache_dir)
+    try:
+        with open(profile_path(path, key, cache_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return parse_and_profile(path, key, cache_dir)[1]
+
+
+def load_clean(path=DATA_PATH, cache_dir=CACHE_DIR, policy=MISSING_POLICY):
+    """Return the cleaned, typed frame, served from a memory-mapped snapshot when one exists.
+
+    `policy` says what happens to rows with missing values (see quality.MISSING_POLICIES);
+    each policy has its own snapshot and fingerprint.
+    """
+    key = source_key(path, cache_dir)
+    snapshot = snapshot_path(path, key, cache_dir, policy)
+
+    if os.path.exists(snapshot):
+        with section('ingest.snapshot') as span:
+            data = feather.read_feather(snapshot, memory_map=True)
+            span.rows = len(data)
+    else:
+        raw, report = parse_and_profile(path, key, cache_dir)
+        with section('ingest.clean', rows=len(raw)):
+            data = compact(handle_missing(raw, policy, report['fill']))
+        # Uncompressed Feather so later cold starts can memory-map it
+        tmp = f'{snapshot}.{os.getpid()}.tmp'
+        feather.write_feather(data, tmp, compression='uncompressed')
+        os.replace(tmp, snapshot)
+        # Each change to the CSV would otherwise leave another full copy behind; the snapshots
+        # of the other policies for this version stay
+        remove_stale(snapshot, re.escape(source_stem(path)) + r'-([0-9a-f]{16})-v(\d+)(?:-\w+)?\.feather')
+
+    suffix = '' if policy == 'drop' else f'-{policy}'
+    data.attrs['fingerprint'] = f'{key[:16]}-v{SCHEMA_VERSION}{suffix}'
+    # Names the cache entries derived from the frame, e.g. the model directory
+    data.attrs['source'] = source_stem(path)
+    return data
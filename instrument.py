@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def rss_bytes():
+    # Current resident set size, or None where /proc is unavailable (macOS, Windows): the
+    # process peak is no stand-in, since every delta taken from it would be zero or bogus
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+
+
+def peak_rss_bytes():
+    # High-water mark of the process' resident set size; None on Windows, which lacks the
+    # resource module (it is Unix-only, hence the local import)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def rss_delta_mb(start, end):
+    # Memory growth between two rss_bytes() readings, None when RSS is unavailable
+    return None if start is None or end is None else (end - start) / 2**20
+
+
+class Span:
+    def __init__(self, registry, name, rows=None):
+        self.registry = registry
+        self.name = name
+        self.rows = rows
+        self._wall = time.perf_counter()
+        # Thread CPU time: every Streamlit session runs its script in its own thread
+        self._cpu = time.thread_time()
+        self._rss = rss_bytes()
+
+    def stop(self, rows=None):
+        record = {
+            'section': self.name,
+            'wall_s': time.perf_counter() - self._wall,
+            'cpu_s': time.thread_time() - self._cpu,
+            'rows': rows if rows is not None else self.rows,
+            # Process-wide, so concurrent sessions show up in each other's deltas
+            'mem_delta_mb': rss_delta_mb(self._rss, rss_bytes()),
+            'time': time.time(),
+        }
+        self.registry.add(record)
+        return record
+
+
+class Instrumentation:
+    """Per-section wall/CPU time, rows and memory delta, kept per rerun and as a bounded
+    history per section for p50/p95 across sessions."""
+
+    def __init__(self, history=1000):
+        self.samples = defaultdict(lambda: deque(maxlen=history))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def begin_run(self):
+        # Records made by this thread from now on belong to the current rerun
+        self._local.run = []
+        return self._local.run
+
+    def current_run(self):
+        return getattr(self._local, 'run', [])
+
+    def add(self, record):
+        with self._lock:
+            self.samples[record['section']].append(record)
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            run.append(record)
+
+    def start(self, name, rows=None):
+        return Span(self, name, rows)
+
+    @contextmanager
+    def section(self, name, rows=None):
+        span = self.start(name, rows)
+        try:
+            yield span
+        finally:
+            span.stop(span.rows)
+
+    def summary(self):
+        with self._lock:
+            samples = {name: list(records) for name, records in self.samples.items()}
+        rows = []
+        for name, records in sorted(samples.items()):
+            wall = np.array([r['wall_s'] for r in records])
+            deltas = [r['mem_delta_mb'] for r in records if r['mem_delta_mb'] is not None]
+            rows.append({
+                'section': name,
+                'count': len(records),
+                'p50_ms': np.percentile(wall, 50) * 1000,
+                'p95_ms': np.percentile(wall, 95) * 1000,
+                'cpu_ms_mean': np.mean([r['cpu_s'] for r in records]) * 1000,
+                'mem_delta_mb_mean': np.mean(deltas) if deltas else None,
+                'rows_last': records[-1]['rows'],
+            })
+        return rows
+
+    def prometheus_text(self):
+        lines = [
+            '# HELP stroke_app_section_seconds Wall time per app section.',
+            '# TYPE stroke_app_section_seconds summary',
+        ]
+        for row in self.summary():
+            label = row['section'].replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'stroke_app_section_seconds{{section="{label}",quantile="0.5"}} {row["p50_ms"] / 1000:.6f}')
+            lines.append(f'stroke_app_section_seconds{{section="{label}",quantile="0.95"}} {row["p95_ms"] / 1000:.6f}')
+            lines.append(f'stroke_app_section_seconds_count{{section="{label}"}} {row["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory, run):
+        """Append this run's records to metrics.jsonl and rewrite this process' metrics-<pid>.prom."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'metrics.jsonl'), 'a') as f:
+            for record in run:
+                f.write(json.dumps({**record, 'pid': os.getpid()}) + '\n')
+        prom = os.path.join(directory, f'metrics-{os.getpid()}.prom')
+        tmp = f'{prom}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, prom)
+
+
+# One registry per process, shared by the app and the modules it calls
+REGISTRY = Instrumentation()
+section = REGISTRY.section
@@ -0,0 +1,84 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Two-sided coverage of the stroke rate intervals
+CONFIDENCE = 0.95
+
+
+def wilson_interval(strokes, totals, confidence=CONFIDENCE):
+    """Wilson score interval of strokes / totals, elementwise; NaN where a level has no patients.
+
+    Unlike the normal approximation it stays inside [0, 1] and is still informative
+    for groups with zero or very few strokes (e.g. Never_worked).
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    strokes = np.asarray(strokes, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = strokes / totals
+        denominator = 1 + z * z / totals
+        centre = (p + z * z / (2 * totals)) / denominator
+        half = z * np.sqrt(p * (1 - p) / totals + z * z / (4 * totals * totals)) / denominator
+    # Clipped so rounding cannot put a zero-stroke bound a hair below 0
+    return np.clip(centre - half, 0, 1), np.clip(centre + half, 0, 1)
+
+
+def bootstrap_rates(no_stroke, stroke, resamples, rng):
+    """Stroke rate of every level in `resamples` bootstrap replicates of one factor, shape (resamples, levels).
+
+    Resampling n patients with replacement and counting them per (level, stroke) cell
+    is a multinomial draw over the observed cell frequencies, so every replicate is
+    drawn at once from the counts: the cost depends on the number of levels, not rows.
+    """
+    cells = np.stack([no_stroke, stroke], axis=1).ravel().astype(np.int64)
+    n = int(cells.sum())
+    if n == 0:
+        return np.full((resamples, len(no_stroke)), np.nan)
+    counts = rng.multinomial(n, cells / n, size=resamples).reshape(resamples, -1, 2)
+    totals = counts.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # A level can be missing from a replicate entirely; it then has no rate
+        return np.where(totals > 0, counts[:, :, 1] / totals, np.nan)
+
+
+def stroke_rate_intervals(table, resamples=2000, seed=0, confidence=CONFIDENCE):
+    """The stroke crosstab (crosstab.stroke_crosstab) with Wilson and percentile bootstrap bounds per level.
+
+    Each factor is resampled separately over its own patients, from one generator
+    seeded with `seed`, so the same table always gives the same intervals.
+    """
+    rng = np.random.default_rng(seed)
+    table = table.copy()
+    table['wilson_low'], table['wilson_high'] = wilson_interval(table['stroke'], table['total'], confidence)
+    low, high = np.full(len(table), np.nan), np.full(len(table), np.nan)
+    tail = (1 - confidence) / 2 * 100
+    for factor in pd.unique(table['factor']):
+        rows = np.flatnonzero(table['factor'].to_numpy() == factor)
+        rates = bootstrap_rates(table['no_stroke'].to_numpy()[rows], table['stroke'].to_numpy()[rows], resamples, rng)
+        observed = ~np.isnan(rates).all(axis=0)
+        if observed.any():
+            bounds = np.nanpercentile(rates[:, observed], [tail, 100 - tail], axis=0)
+            low[rows[observed]], high[rows[observed]] = bounds
+    table['bootstrap_low'], table['bootstrap_high'] = low, high
+    return table
+
+
+def interval_table(intervals, factor, panels):
+    # One row per pie panel, with the rate and both intervals as percentages
+    counts = intervals[intervals['factor'] == factor].set_index('level')
+    rows = []
+    for level, title in panels:
+        # A cohort can leave a level without patients, which then has no rate at all
+        if level not in counts.index or counts.loc[level, 'total'] == 0:
+            continue
+        row = counts.loc[level]
+        # Every replicate of a group with no strokes (or only strokes) has the same rate,
+        # so its bootstrap interval collapses to a point that says nothing
+        degenerate = row['stroke'] == 0 or row['stroke'] == row['total']
+        rows.append({'group': title.strip(), 'patients': int(row['total']), 'strokes': int(row['stroke']),
+                     'rate': f"{row['rate']:.1%}",
+                     'wilson': f"{row['wilson_low']:.1%} - {row['wilson_high']:.1%}",
+                     'bootstrap': 'n/a' if degenerate else f"{row['bootstrap_low']:.1%} - {row['bootstrap_high']:.1%}"})
+    return pd.DataFrame(rows)
@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from instrument import section
+
+
+class Job:
+    """One background computation and the sessions waiting for it."""
+
+    def __init__(self, key, owner):
+        self.key = key
+        self.owners = {owner}
+        self.future = Future()
+        # The worker pool's own future, set while the job waits for a worker
+        self.queued = None
+
+    @property
+    def state(self):
+        if self.future.cancelled():
+            return 'cancelled'
+        if self.future.done():
+            return 'failed' if self.future.exception() is not None else 'done'
+        return 'running' if self.future.running() else 'queued'
+
+    def done(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        try:
+            self.future.exception(timeout)
+        except TimeoutError:
+            pass
+        return self.done()
+
+    def result(self):
+        # Re-raises a failed computation in the caller's thread
+        return self.future.result()
+
+    def error(self):
+        # The exception a failed computation raised, None otherwise
+        return self.future.exception() if self.state == 'failed' else None
+
+
+class JobScheduler:
+    """Runs expensive aggregations and figure renders on a pool of worker threads.
+
+    Shared by every session of the app process. Jobs are keyed (by dataset
+    fingerprint and computation) so a session asking for something another
+    session already queued joins the existing job instead of starting a second
+    one. Each job remembers the sessions that own it; a session releases the
+    jobs it no longer shows, and a queued job nobody owns any more is cancelled.
+    A finished job leaves the scheduler, so its result is only held by the
+    caches its computation went through (and by the sessions still showing it);
+    the last `keep_finished` keys are remembered and a later submit for one of
+    them runs inline in the caller, where it reads the result back from those
+    caches. A failed job is kept, so the sessions waiting on it can show its
+    error, until a submit with `retry=True` replaces it. With `workers=0` jobs
+    run inline in the caller.
+    """
+
+    def __init__(self, workers=2, keep_finished=256):
+        self.workers = workers
+        self.keep_finished = keep_finished
+        self.submitted = 0
+        self.joined = 0
+        self.cancelled = 0
+        self.reused = 0
+        # Queued, running and failed jobs
+        self._jobs = OrderedDict()
+        # Keys of recently finished jobs; their results are in the caches
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='stroke-job') if workers > 0 else None
+
+    def submit(self, key, compute, owner, retry=False):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and retry and job.state == 'failed':
+                del self._jobs[key]
+                job = None
+            if job is not None:
+                job.owners.add(owner)
+                self._jobs.move_to_end(key)
+                self.joined += 1
+                return job
+            job = self._jobs[key] = Job(key, owner)
+            inline = key in self._finished
+            if inline:
+                self.reused += 1
+            else:
+                self.submitted += 1
+
+        if self._pool is None or inline:
+            self._run(job, compute)
+        else:
+            job.queued = self._pool.submit(self._run, job, compute)
+        return job
+
+    def _run(self, job, compute):
+        if not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            with section(f'job:{job.key[-1]}'):
+                result = compute()
+        except Exception as error:
+            job.future.set_exception(error)
+            self._trim()
+            return
+        self._finish(job)
+        job.future.set_result(result)
+
+    def _finish(self, job):
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            self._finished[job.key] = None
+            self._finished.move_to_end(job.key)
+            while len(self._finished) > self.keep_finished:
+                self._finished.popitem(last=False)
+
+    def _forget(self, job):
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def release(self, owner, keep=()):
+        """Drop `owner`'s interest in every job not in `keep`; cancel queued jobs left without owners.
+
+        A job already running is left to finish, since its result still lands in the
+        shared caches.
+        """
+        keep = set(keep)
+        with self._lock:
+            orphans = []
+            for key, job in self._jobs.items():
+                if key not in keep and owner in job.owners:
+                    job.owners.discard(owner)
+                    if not job.owners and not job.done():
+                        orphans.append(job)
+        for job in orphans:
+            # Only succeeds while no worker has picked the job up
+            if job.queued is not None and job.queued.cancel():
+                job.future.cancel()
+                self._forget(job)
+                with self._lock:
+                    self.cancelled += 1
+
+    def _trim(self):
+        # Failed jobs are evicted oldest first; queued and running ones are never dropped
+        with self._lock:
+            failed = [key for key, job in self._jobs.items() if job.done()]
+            for key in failed[:max(0, len(failed) - self.keep_finished)]:
+                del self._jobs[key]
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            return {'workers': self.workers, 'submitted': self.submitted, 'joined': self.joined,
+                    'reused': self.reused, 'cancelled': self.cancelled, 'queued': states.count('queued'),
+                    'running': states.count('running'), 'finished': len(self._finished),
+                    'failed': states.count('failed')}
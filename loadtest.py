@@ -0,0 +1,223 @@
+"""Load test of app.py: simulated dashboard sessions driven headlessly through Streamlit's AppTest.
+
+Every session loads the page, then keeps switching the chart_type selection
+between the four views and toggling "Show raw data". Reported are throughput,
+latency percentiles per action and the memory of every process:
+
+    python loadtest.py --processes 4 --duration 60
+    python loadtest.py --processes 2 --sessions-per-process 4 --think 1 --out loadtest.json
+
+AppTest is not thread-safe, so concurrency comes from worker processes. Each one
+stands in for an app replica with its own caches. The sessions of one process are
+interleaved one script run at a time, as the sessions of one Streamlit server share
+its interpreter lock. A page still waiting for background renders is rerun every
+STROKE_APP_JOB_POLL_SECONDS, as the browser's progress fragment would, and the time
+until it shows everything is reported as "ready". The app is configured through the
+usual STROKE_APP_* environment variables, which the worker processes inherit.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from instrument import peak_rss_bytes, rss_bytes
+from settings import JOB_POLL_SECONDS
+
+CHART_TYPES = ("Distributions of Age, Glucose, and BMI", "Box Plots", "Pie Charts", "Correlation Matrix")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def megabytes(value):
+    # None stays None: without /proc (or, for the peak, on Windows) the figure is unavailable
+    return None if value is None else value / 2**20
+
+
+def format_mb(value, width):
+    return f'{"n/a":>{width}}' if value is None else f'{value:{width}.1f}'
+
+
+class Session:
+    """One simulated user: an AppTest instance plus the state of its current action."""
+
+    def __init__(self, app, timeout, rng, toggle_share):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(app, default_timeout=timeout)
+        self.rng = rng
+        self.toggle_share = toggle_share
+        self.chart_type = CHART_TYPES[0]
+        self.action = None
+        self.started = None
+        self.next_at = 0.0
+
+    def run(self, action, change=None):
+        # One script run; returns its wall time
+        start = time.perf_counter()
+        if change is not None:
+            change()
+        self.at.run()
+        elapsed = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f'{action}: {self.at.exception[0].message}')
+        return elapsed
+
+    def waiting(self):
+        # The progress bar is only on the page while background renders are outstanding
+        return len(self.at.get('progress')) > 0
+
+    def next_action(self):
+        if self.rng.random() < self.toggle_share:
+            checkbox = next(c for c in self.at.checkbox if c.label == 'Show raw data')
+            return 'raw_data', lambda: checkbox.set_value(not checkbox.value)
+        self.chart_type = str(self.rng.choice([c for c in CHART_TYPES if c != self.chart_type]))
+        selectbox = self.at.sidebar.selectbox[0]
+        return 'chart_type', lambda: selectbox.set_value(self.chart_type)
+
+
+def run_process(index, app, sessions, duration, timeout, seed, think, toggle_share, barrier, results):
+    warnings.simplefilter('ignore')
+    samples = {'load': [], 'chart_type': [], 'raw_data': [], 'ready': []}
+    errors = []
+    rng = np.random.default_rng(seed + index)
+    users = [Session(app, timeout, np.random.default_rng(rng.integers(2**32)), toggle_share)
+             for _ in range(sessions)]
+    # Raises BrokenBarrierError rather than waiting forever when another process failed to start
+    barrier.wait(timeout)
+
+    start = time.perf_counter()
+    for user in users:
+        user.action, user.started = 'load', time.perf_counter()
+        samples['load'].append(user.run('load'))
+    rss_loaded = rss_bytes()
+
+    deadline = start + duration
+    while time.perf_counter() < deadline:
+        # Earliest due session first: a waiting page is due at its next poll, an idle one after its think time
+        user = min(users, key=lambda u: u.next_at)
+        now = time.perf_counter()
+        if user.next_at > now:
+            time.sleep(min(user.next_at, deadline) - now)
+            continue
+        try:
+            if user.waiting():
+                user.run('poll')
+            else:
+                name, change = user.next_action()
+                user.action, user.started = name, time.perf_counter()
+                samples[name].append(user.run(name, change))
+            if user.waiting():
+                user.next_at = time.perf_counter() + JOB_POLL_SECONDS
+            else:
+                if user.action is not None:
+                    samples['ready'].append(time.perf_counter() - user.started)
+                    user.action = None
+                user.next_at = time.perf_counter() + (user.rng.exponential(think) if think > 0 else 0)
+        except Exception as error:
+            errors.append(repr(error))
+            user.action, user.next_at = None, time.perf_counter()
+
+    results.put({
+        'process': index,
+        'pid': os.getpid(),
+        'sessions': sessions,
+        'elapsed_s': time.perf_counter() - start,
+        'samples': samples,
+        'errors': errors,
+        'rss_loaded_mb': megabytes(rss_loaded),
+        'rss_mb': megabytes(rss_bytes()),
+        'peak_rss_mb': megabytes(peak_rss_bytes()),
+    })
+
+
+def latency_table(processes):
+    rows = {}
+    for name in ('load', 'chart_type', 'raw_data', 'ready'):
+        values = np.array([s for p in processes for s in p['samples'][name]]) * 1000
+        if len(values):
+            rows[name] = {'count': len(values), **{f'p{q}_ms': float(np.percentile(values, q)) for q in PERCENTILES},
+                          'max_ms': float(values.max())}
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', default='app.py', help='Streamlit script to drive (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=2, help='concurrent worker processes (default: %(default)s)')
+    parser.add_argument('--sessions-per-process', type=int, default=1,
+                        help='sessions interleaved in each process, sharing its caches (default: %(default)s)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load after the first page load')
+    parser.add_argument('--think', type=float, default=0,
+                        help='mean pause between a page being ready and the next action, in seconds (default: none)')
+    parser.add_argument('--toggle-share', type=float, default=0.25,
+                        help='share of actions that toggle "Show raw data" rather than switch charts')
+    parser.add_argument('--timeout', type=float, default=120, help='limit for a single script run, in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    # Fresh interpreters, so each process pays for its own imports and caches like a replica would
+    context = multiprocessing.get_context('spawn')
+    barrier, results = context.Barrier(args.processes), context.Queue()
+    workers = [context.Process(target=run_process, args=(i, args.app, args.sessions_per_process, args.duration,
+                                                         args.timeout, args.seed, args.think, args.toggle_share,
+                                                         barrier, results))
+               for i in range(args.processes)]
+    for worker in workers:
+        worker.start()
+    processes = []
+    while len(processes) < len(workers):
+        try:
+            processes.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+    for worker in workers:
+        worker.join()
+    if len(processes) < len(workers):
+        print(f'{len(workers) - len(processes)} of {len(workers)} processes exited without results', file=sys.stderr)
+        return 1
+    processes.sort(key=lambda p: p['process'])
+
+    sessions = args.processes * args.sessions_per_process
+    elapsed = max(p['elapsed_s'] for p in processes)
+    actions = sum(len(p['samples'][name]) for p in processes for name in ('chart_type', 'raw_data'))
+    latency = latency_table(processes)
+    print(f'{sessions} sessions ({args.processes} processes x {args.sessions_per_process}), {elapsed:.1f} s, '
+          f'{actions} actions, {actions / elapsed:.2f} actions/s')
+    print(f'{"action":<12} {"count":>6} ' + ' '.join(f'{f"p{q} ms":>9}' for q in PERCENTILES) + f' {"max ms":>9}')
+    for name, row in latency.items():
+        print(f'{name:<12} {row["count"]:>6} ' + ' '.join(f'{row[f"p{q}_ms"]:9.1f}' for q in PERCENTILES) +
+              f' {row["max_ms"]:9.1f}')
+    print(f'{"process":<8} {"pid":>8} {"actions":>8} {"loaded MB":>10} {"rss MB":>8} {"peak MB":>8} {"errors":>7}')
+    for p in processes:
+        count = len(p['samples']['chart_type']) + len(p['samples']['raw_data'])
+        print(f'{p["process"]:<8} {p["pid"]:>8} {count:>8} {format_mb(p["rss_loaded_mb"], 10)} '
+              f'{format_mb(p["rss_mb"], 8)} {format_mb(p["peak_rss_mb"], 8)} {len(p["errors"]):>7}')
+    for p in processes:
+        for error in p['errors'][:3]:
+            print(f'process {p["process"]}: {error}', file=sys.stderr)
+
+    if args.out:
+        summary = {
+            'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'cpus': os.cpu_count(), 'args': vars(args),
+                     'env': {k: v for k, v in os.environ.items() if k.startswith('STROKE_APP_')}},
+            'elapsed_s': elapsed,
+            'actions': actions,
+            'throughput_per_s': actions / elapsed,
+            'latency': latency,
+            'processes': [{k: v for k, v in p.items() if k != 'samples'} for p in processes],
+        }
+        with open(args.out, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f'results written to {args.out}')
+    return 1 if any(p['errors'] for p in processes) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""Stroke risk models trained on the cleaned dataset, in plain NumPy.
+
+Two models share one feature encoding: an L2-regularized logistic regression
+fitted by Newton's method and gradient-boosted depth-limited trees grown from
+feature histograms. Trained models are saved as one .npy file per array, so
+later processes load them memory-mapped instead of retraining:
+
+    python model.py train
+    python model.py score patients.csv --out scores.csv
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggcache import AggregateCache
+from correlation import average_ranks
+from ingest import CATEGORIES, clean, load_clean, read_csv_typed, remove_stale
+from settings import CACHE_DIR, DATA_PATH
+
+# Bump whenever the encoding or the training procedure changes so saved models are retrained
+MODEL_VERSION = 1
+
+NUMERIC_FEATURES = ['age', 'avg_glucose_level', 'bmi', 'hypertension', 'heart_disease']
+CATEGORICAL_FEATURES = ['gender', 'ever_married', 'work_type', 'Residence_type', 'smoking_status']
+# One indicator per level of the fixed category sets, so columns never depend on the data
+FEATURE_NAMES = NUMERIC_FEATURES + [f'{column}={level}' for column in CATEGORICAL_FEATURES for level in CATEGORIES[column]]
+
+# Encoded training matrices, keyed by the dataset version they were trained on
+ENCODINGS = AggregateCache(max_entries=8)
+
+
+def encode(frame):
+    """float32 feature matrix in FEATURE_NAMES order, built from categorical codes."""
+    columns = [frame[column].to_numpy(dtype=np.float32) for column in NUMERIC_FEATURES]
+    for column in CATEGORICAL_FEATURES:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == CATEGORIES[column]:
+            codes = values.cat.codes.to_numpy()
+        else:
+            codes = pd.Categorical(values, categories=CATEGORIES[column]).codes
+        columns.extend((codes == level).astype(np.float32) for level in range(len(CATEGORIES[column])))
+    return np.column_stack(columns)
+
+
+def encode_cached(frame, key):
+    # Only for frames whose identity the caller vouches for: pandas copies attrs (and so the
+    # fingerprint) onto slices and reorders, so the frame's own fingerprint cannot be the key
+    if key is None:
+        return encode(frame)
+    return ENCODINGS.get_or_compute((key, len(frame)), 'features', lambda: encode(frame))
+
+
+def sigmoid(z):
+    return 1 / (1 + np.exp(-np.clip(z, -35, 35)))
+
+
+def roc_auc(y, scores):
+    # Mann-Whitney U from average ranks, so tied scores count half
+    ranks = average_ranks(scores, np.sort(scores))
+    positives = y == 1
+    n_pos, n_neg = positives.sum(), (~positives).sum()
+    if n_pos == 0 or n_neg == 0:
+        return np.nan
+    return (ranks[positives].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+class LogisticModel:
+    """Logistic regression with an L2 penalty, fitted on standardized features by Newton's method.
+
+    The standardization is folded into the coefficients afterwards, so scoring is a
+    single matrix-vector product on the raw encoding.
+    """
+
+    def __init__(self, l2=1.0, max_iter=50, tol=1e-8):
+        self.l2 = l2
+        self.max_iter = max_iter
+        self.tol = tol
+        self.coef = None
+        self.intercept = None
+
+    def fit(self, X, y):
+        X = X.astype(np.float64)
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1
+        Z = np.column_stack([np.ones(len(X)), (X - mean) / scale])
+        penalty = np.full(Z.shape[1], self.l2)
+        penalty[0] = 0  # the intercept is not shrunk
+        w = np.zeros(Z.shape[1])
+        for _ in range(self.max_iter):
+            p = sigmoid(Z @ w)
+            gradient = Z.T @ (p - y) + penalty * w
+            hessian = (Z * (p * (1 - p))[:, None]).T @ Z + np.diag(penalty)
+            step = np.linalg.solve(hessian, gradient)
+            w -= step
+            if np.abs(step).max() < self.tol:
+                break
+        self.coef = w[1:] / scale
+        self.intercept = np.array([w[0] - (w[1:] * mean / scale).sum()])
+        return self
+
+    def decision(self, X):
+        return X @ self.coef + self.intercept[0]
+
+    def predict_proba(self, X):
+        return sigmoid(self.decision(X))
+
+    def arrays(self):
+        return {'coef': self.coef, 'intercept': self.intercept}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        model = cls()
+        model.coef, model.intercept = arrays['coef'], arrays['intercept']
+        return model
+
+
+def leaf_of_code(depth):
+    """Leaf reached for every combination of split outcomes, bit k being "right at node k"."""
+    codes = np.arange(2 ** (2 ** depth - 1))
+    leaf = np.zeros(len(codes), dtype=np.intp)
+    for level in range(depth):
+        leaf = 2 * leaf + ((codes >> (2 ** level - 1 + leaf)) & 1)
+    return leaf
+
+
+class BoostedTrees:
+    """Gradient-boosted trees for the log loss, grown from per-feature histograms.
+
+    Every tree is complete to `depth` levels and stored heap-ordered (children of
+    node i are 2i+1 and 2i+2): a (trees, internal nodes) array of split features,
+    one of thresholds (right when x >= threshold) and a (trees, leaves) array of
+    leaf values. Nodes that are not worth splitting send every row left.
+    """
+
+    def __init__(self, n_trees=100, depth=3, learning_rate=0.1, bins=32, min_leaf=20, l2=1.0):
+        if not 1 <= depth <= 4:
+            raise ValueError('depth must be between 1 and 4')
+        self.n_trees = n_trees
+        self.depth = depth
+        self.learning_rate = learning_rate
+        self.bins = bins
+        self.min_leaf = min_leaf
+        self.l2 = l2
+        self.base = None
+        self.feature = None
+        self.threshold = None
+        self.value = None
+
+    def _best_splits(self, binned, edges, node, g, h, n_nodes):
+        # Best (gain, feature, threshold) for each node of one level, scanning bin histograms
+        best = np.zeros(n_nodes), np.zeros(n_nodes, dtype=np.int32), np.full(n_nodes, np.inf)
+        for j, feature_edges in enumerate(edges):
+            n_bins = len(feature_edges) + 1
+            if n_bins < 2:
+                continue
+            cells = node * n_bins + binned[:, j]
+            G = np.bincount(cells, weights=g, minlength=n_nodes * n_bins).reshape(n_nodes, n_bins)
+            H = np.bincount(cells, weights=h, minlength=n_nodes * n_bins).reshape(n_nodes, n_bins)
+            C = np.bincount(cells, minlength=n_nodes * n_bins).reshape(n_nodes, n_bins)
+            GL, HL, CL = G.cumsum(axis=1)[:, :-1], H.cumsum(axis=1)[:, :-1], C.cumsum(axis=1)[:, :-1]
+            Gt, Ht, Ct = G.sum(axis=1, keepdims=True), H.sum(axis=1, keepdims=True), C.sum(axis=1, keepdims=True)
+            gain = GL ** 2 / (HL + self.l2) + (Gt - GL) ** 2 / (Ht - HL + self.l2) - Gt ** 2 / (Ht + self.l2)
+            gain[(CL < self.min_leaf) | (Ct - CL < self.min_leaf)] = 0
+            split = gain.argmax(axis=1)
+            split_gain = gain[np.arange(n_nodes), split]
+            better = split_gain > best[0]
+            best[0][better] = split_gain[better]
+            best[1][better] = j
+            best[2][better] = feature_edges[split[better]]
+        return best
+
+    def fit(self, X, y):
+        n = len(X)
+        quantiles = np.linspace(0, 1, self.bins + 1)[1:-1]
+        # Split candidates are the distinct inner quantiles; bin b holds edges[b-1] <= x < edges[b]
+        edges = [np.unique(np.quantile(X[:, j], quantiles)) for j in range(X.shape[1])]
+        binned = np.column_stack([np.searchsorted(e, X[:, j], side='right') for j, e in enumerate(edges)])
+
+        rate = np.clip(y.mean(), 1e-6, 1 - 1e-6)
+        self.base = np.array([np.log(rate / (1 - rate))])
+        n_internal, n_leaves = 2 ** self.depth - 1, 2 ** self.depth
+        self.feature = np.zeros((self.n_trees, n_internal), dtype=np.int32)
+        self.threshold = np.full((self.n_trees, n_internal), np.inf, dtype=np.float32)
+        self.value = np.zeros((self.n_trees, n_leaves))
+        raw = np.full(n, self.base[0])
+        rows = np.arange(n)
+        for t in range(self.n_trees):
+            p = sigmoid(raw)
+            g, h = p - y, p * (1 - p)
+            node = np.zeros(n, dtype=np.int64)
+            for level in range(self.depth):
+                first = 2 ** level - 1
+                gain, feature, threshold = self._best_splits(binned, edges, node - first, g, h, 2 ** level)
+                self.feature[t, first:first + 2 ** level] = feature
+                self.threshold[t, first:first + 2 ** level] = threshold
+                node = 2 * node + 1 + (X[rows, self.feature[t, node]] >= self.threshold[t, node])
+            leaf = node - n_internal
+            G = np.bincount(leaf, weights=g, minlength=n_leaves)
+            H = np.bincount(leaf, weights=h, minlength=n_leaves)
+            self.value[t] = -self.learning_rate * G / (H + self.l2)
+            raw += self.value[t, leaf]
+        return self
+
+    def decision(self, X, chunk_rows=65536):
+        # Each tree's split outcomes are packed into one small integer per row, which
+        # indexes a per-tree table of leaf values: a few column compares and one lookup
+        n_internal = self.feature.shape[1]
+        tables = self.value[:, leaf_of_code(self.depth)]
+        raw = np.empty(len(X))
+        for start in range(0, len(X), chunk_rows):
+            columns = np.ascontiguousarray(X[start:start + chunk_rows].T)
+            out = np.full(columns.shape[1], self.base[0])
+            code = np.empty(columns.shape[1], dtype=np.uint8 if n_internal <= 8 else np.uint16)
+            for t in range(len(self.feature)):
+                code[:] = 0
+                for k in range(n_internal):
+                    code |= (columns[self.feature[t, k]] >= self.threshold[t, k]).astype(code.dtype) << k
+                out += tables[t].take(code)
+            raw[start:start + chunk_rows] = out
+        return raw
+
+    def predict_proba(self, X):
+        return sigmoid(self.decision(X))
+
+    def arrays(self):
+        return {'base': self.base, 'feature': self.feature, 'threshold': self.threshold, 'value': self.value}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        model = cls(n_trees=len(arrays['feature']), depth=int(np.log2(arrays['value'].shape[1])))
+        model.base, model.feature, model.threshold, model.value = (
+            arrays['base'], arrays['feature'], arrays['threshold'], arrays['value'])
+        return model
+
+
+class RiskModel:
+    """Both models plus their hold-out metrics, saved to and loaded from a directory."""
+
+    MODELS = {'logistic': LogisticModel, 'boosted': BoostedTrees}
+
+    def __init__(self, models, metrics):
+        self.models = models
+        self.metrics = metrics
+
+    @classmethod
+    def train(cls, data, holdout=0.2, seed=0, key=None):
+        """Report AUC on a seeded hold-out split, then refit every model on all rows.
+
+        `key` identifies the dataset version, so its encoding can be reused across trainings.
+        """
+        X, y = encode_cached(data, key), data['stroke'].to_numpy(dtype=np.float64)
+        test = np.random.default_rng(seed).random(len(X)) < holdout
+        metrics = {'rows': int(len(X)), 'stroke_rate': float(y.mean())}
+        models = {}
+        for name, model_class in cls.MODELS.items():
+            start = time.perf_counter()
+            scores = model_class().fit(X[~test], y[~test]).predict_proba(X[test])
+            metrics[f'{name}_auc'] = float(roc_auc(y[test], scores))
+            models[name] = model_class().fit(X, y)
+            metrics[f'{name}_train_s'] = time.perf_counter() - start
+        return cls(models, metrics)
+
+    def score(self, frame):
+        """Stroke probability of every row under each model, as a frame aligned with `frame`."""
+        # Always encoded afresh: frames to score are often subsets or reorderings of the
+        # training frame and carry its fingerprint
+        X = encode(frame)
+        return pd.DataFrame({name: model.predict_proba(X) for name, model in self.models.items()}, index=frame.index)
+
+    def save(self, directory):
+        tmp = f'{directory}.{os.getpid()}.tmp'
+        os.makedirs(tmp, exist_ok=True)
+        for name, model in self.models.items():
+            for key, array in model.arrays().items():
+                np.save(os.path.join(tmp, f'{name}.{key}.npy'), array)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': MODEL_VERSION, 'features': FEATURE_NAMES, 'metrics': self.metrics}, f)
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            # Another process saved the same model first
+            shutil.rmtree(tmp)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        models = {}
+        for name, model_class in cls.MODELS.items():
+            arrays = {}
+            for file in os.listdir(directory):
+                if file.startswith(f'{name}.') and file.endswith('.npy'):
+                    arrays[file[len(name) + 1:-4]] = np.load(os.path.join(directory, file), mmap_mode='r')
+            models[name] = model_class.from_arrays(arrays)
+        return cls(models, meta['metrics'])
+
+
+def model_dir(data, cache_dir=CACHE_DIR):
+    source = data.attrs.get('source', 'data')
+    return os.path.join(cache_dir, f'model-{source}-{data.attrs["fingerprint"]}-m{MODEL_VERSION}')
+
+
+def model_pattern(data):
+    # Every version of the models trained on `data`'s source; other policies of one version are kept
+    return f'model-{re.escape(data.attrs.get("source", "data"))}-([0-9a-f]{{16}})-v(\\d+)(?:-\\w+)?-m(\\d+)'
+
+
+def train_or_load(data, cache_dir=CACHE_DIR):
+    """The models for this dataset version: memory-mapped from disk, trained and saved on a miss."""
+    directory = model_dir(data, cache_dir)
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        os.makedirs(cache_dir, exist_ok=True)
+        RiskModel.train(data, key=data.attrs['fingerprint']).save(directory)
+        remove_stale(directory, model_pattern(data))
+    return RiskModel.load(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['train', 'score'])
+    parser.add_argument('input', nargs='?', help='CSV of patients to score, same columns as the dataset')
+    parser.add_argument('--data', default=DATA_PATH, help='training CSV (default: %(default)s)')
+    parser.add_argument('--out', default='scores.csv', help='where to write scores (default: %(default)s)')
+    parser.add_argument('--chunksize', type=int, default=500_000, help='rows scored per batch')
+    args = parser.parse_args(argv)
+
+    model = train_or_load(load_clean(args.data, CACHE_DIR))
+    print(json.dumps(model.metrics, indent=2))
+    if args.command == 'train':
+        return 0
+    if not args.input:
+        parser.error('score needs an input CSV')
+
+    rows, start = 0, time.perf_counter()
+    for i, chunk in enumerate(read_csv_typed(args.input, chunksize=args.chunksize)):
+        # Rows with missing measures are dropped, the same as for training
+        chunk = clean(chunk)
+        scores = model.score(chunk)
+        scores.insert(0, 'id', chunk['id'].to_numpy())
+        scores.to_csv(args.out, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(f'scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.out}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from ingest import clean, read_csv_typed
+from streaming import StreamingSummary
+
+
+def summarize_frame(frame):
+    summary = StreamingSummary()
+    summary.update(frame)
+    return summary
+
+
+class RangeReader:
+    """File-like view of bytes [start, end) of a file, for pandas to parse a slice of a CSV."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        block = self._file.read(size)
+        self._remaining -= len(block)
+        return block
+
+    def close(self):
+        self._file.close()
+
+
+def summarize_csv_range(path, start, end, names, chunksize):
+    # Worker side: parse and fold one newline-aligned byte range of the CSV
+    summary = StreamingSummary()
+    reader = RangeReader(path, start, end)
+    try:
+        for chunk in read_csv_typed(reader, header=None, names=names, chunksize=chunksize):
+            summary.update(clean(chunk))
+    finally:
+        reader.close()
+    return summary
+
+
+def csv_ranges(path, parts):
+    """Split a CSV into `parts` byte ranges on line boundaries, skipping the header line."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        bounds = [len(header)]
+        for i in range(1, parts):
+            f.seek(max(bounds[-1], size * i // parts))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+        bounds.append(size)
+    names = header.decode().strip().split(',')
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+    return names, ranges
+
+
+# Serializes the __main__ swap below across the threads that submit work
+_main_lock = threading.Lock()
+
+
+@contextmanager
+def importable_main():
+    """Make this module the __main__ that workers launched meanwhile prepare from.
+
+    forkserver and spawn workers re-import the parent's __main__, and under Streamlit
+    that is the app script, which would then run again in every worker. This module
+    is importable and has no side effects, so workers import it instead.
+    """
+    with _main_lock:
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            # Streamlit installs a fresh __main__ for every rerun; keep it if one started meanwhile
+            if sys.modules['__main__'] is sys.modules[__name__]:
+                sys.modules['__main__'] = main
+
+
+def merge(summaries):
+    summaries = list(summaries)
+    total = summaries[0]
+    for summary in summaries[1:]:
+        total.merge(summary)
+    return total
+
+
+class ParallelAggregator:
+    """Process pool that computes partial summaries (moments, histograms, sketches,
+    co-moments, crosstab counts) per partition and merges them in the parent.
+
+    Workers come from a forkserver (spawn where there is none, i.e. Windows), never
+    from fork: the pool starts inside the multi-threaded Streamlit server, on a job
+    thread, and a forked child can deadlock on a lock another thread held (import,
+    logging, allocator). The server is a fresh single-threaded interpreter that
+    preloads this module, so a new worker costs a fork of it. The pool starts
+    workers lazily on submit, so every submit goes through importable_main().
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count()
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            context.set_forkserver_preload([__name__])
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=context)
+
+    def submit(self, fn, *args):
+        with importable_main():
+            return self._pool.submit(fn, *args)
+
+    def summarize_frame(self, data):
+        bounds = np.linspace(0, len(data), self.workers + 1).astype(int)
+        futures = [self.submit(summarize_frame, data.iloc[start:end]) for start, end in zip(bounds, bounds[1:]) if end > start]
+        return merge(future.result() for future in futures)
+
+    def summarize_csv(self, path, chunksize=200_000):
+        names, ranges = csv_ranges(path, self.workers)
+        futures = [self.submit(summarize_csv_range, path, start, end, names, chunksize) for start, end in ranges]
+        return merge(future.result() for future in futures)
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
@@ -0,0 +1,94 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from chartspec import MEASURES
+from crosstab import factor_table
+
+# Interactive versions of the charts in charts.py. Every trace is built from
+# pre-aggregated data (bin counts, box summaries, category counts), never raw rows,
+# so the payload sent to the browser does not grow with the dataset.
+
+
+def rebin(counts, edges, factor):
+    # Merge `factor` adjacent bins to shrink a histogram trace
+    if factor <= 1:
+        return counts, edges
+    n = len(counts) // factor * factor
+    merged, merged_edges = np.add.reduceat(counts[:n], np.arange(0, n, factor)), edges[:n + 1:factor]
+    if n < len(counts):
+        merged, merged_edges = np.append(merged, counts[n:].sum()), np.append(merged_edges, edges[-1])
+    return merged, merged_edges
+
+
+def distributions(histograms, detail=0):
+    fig = make_subplots(rows=1, cols=3, subplot_titles=[f'{title} Distribution' for _, title, _, _ in MEASURES])
+    for i, (column, title, label, color) in enumerate(MEASURES, start=1):
+        counts, edges = rebin(*histograms[column], 2 ** detail)
+        fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                             marker={'color': color, 'line': {'color': 'black', 'width': 1}}, name=title), row=1, col=i)
+        fig.update_xaxes(title_text=label, row=1, col=i)
+        fig.update_yaxes(title_text='Frequency', row=1, col=i)
+    fig.update_layout(showlegend=False, bargap=0)
+    return fig
+
+
+def box_plots(box_stats, detail=0):
+    colors = px.colors.sample_colorscale('RdBu_r', [0.25, 0.75])
+    fig = make_subplots(rows=1, cols=3, subplot_titles=[f'{title} Box Plot' for _, title, _, _ in MEASURES])
+    for i, (column, title, label, _) in enumerate(MEASURES, start=1):
+        for stats, color in zip(box_stats[column], colors):
+            fig.add_trace(go.Box(x=[stats['label']], q1=[stats['q1']], median=[stats['med']], q3=[stats['q3']],
+                                 lowerfence=[stats['whislo']], upperfence=[stats['whishi']],
+                                 fillcolor=color, line={'color': 'black'}, name=stats['label']), row=1, col=i)
+            # Outliers were already capped when the summaries were computed; halve them per detail level
+            fliers = stats['fliers'][::2 ** detail]
+            if len(fliers):
+                fig.add_trace(go.Scatter(x=[stats['label']] * len(fliers), y=fliers, mode='markers',
+                                         marker={'color': 'black', 'symbol': 'circle-open'}, name=stats['label']), row=1, col=i)
+        fig.update_xaxes(title_text='stroke', row=1, col=i)
+        fig.update_yaxes(title_text=label, row=1, col=i)
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def correlation_heatmap(correlation_matrix, detail=0):
+    return px.imshow(correlation_matrix.round(2), text_auto='.2f', color_continuous_scale='RdBu_r', zmin=-1, zmax=1)
+
+
+def distribution_pie(counts, title, detail=0):
+    fig = go.Figure(go.Pie(labels=[str(label) for label in counts.index], values=counts.to_numpy(), sort=False,
+                           marker={'colors': px.colors.qualitative.Pastel}))
+    fig.update_layout(title=title)
+    return fig
+
+
+def stroke_pies(stroke_table, factor, panels, colors, detail=0):
+    counts = factor_table(stroke_table, factor)
+    fig = make_subplots(rows=1, cols=len(panels), specs=[[{'type': 'domain'}] * len(panels)],
+                        subplot_titles=[title.strip() for _, title in panels])
+    for i, (level, _) in enumerate(panels, start=1):
+        if level not in counts.index:
+            continue
+        fig.add_trace(go.Pie(labels=['Stroke', 'No Stroke'], values=counts.loc[level, ['stroke', 'no_stroke']].tolist(),
+                             sort=False, marker={'colors': colors}), row=1, col=i)
+    return fig
+
+
+def payload_size(fig):
+    return len(fig.to_json())
+
+
+def within_budget(build, budget, max_detail=6):
+    """Build a figure, lowering its detail level until the JSON payload fits the budget.
+
+    Returns the figure and its payload size; the size may still exceed the budget
+    when the coarsest level is reached.
+    """
+    for detail in range(max_detail + 1):
+        fig = build(detail)
+        size = payload_size(fig)
+        if size <= budget:
+            break
+    return fig, size
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from crosstab import AGE_BINS, factor_codes
+
+# Values outside these bounds are reported, not changed: ages under 1 are infants
+# recorded in fractions of a year (0.08 is one month) and BMIs past 60 are likely typos
+FLAG_RANGES = {'age': (1, 100), 'avg_glucose_level': (50, 300), 'bmi': (12, 60)}
+
+# Columns missingness is broken down by
+PROFILE_FACTORS = ['gender', 'ever_married', 'work_type', 'Residence_type', 'hypertension', 'heart_disease',
+                   'smoking_status', 'stroke']
+
+# How rows with missing values are handled: "drop" them, "impute" numbers with the median
+# and categories with the most frequent level of the patient's gender and age band, or
+# keep missing categories as an explicit "category" (numbers are imputed as for "impute")
+MISSING_POLICIES = ('drop', 'impute', 'category')
+MISSING_LABEL = 'Unknown'
+
+# Never imputed: rows without an id or a stroke outcome are dropped under every policy
+NOT_IMPUTED = ('id', 'stroke')
+
+
+def impute_groups(raw):
+    # Gender x age band group of every row; -1 where either is missing
+    gender, _ = factor_codes(raw['gender'])
+    band = pd.cut(raw['age'], bins=AGE_BINS).cat.codes.to_numpy()
+    n_bands = len(AGE_BINS) - 1
+    return np.where((gender >= 0) & (band >= 0), gender * n_bands + band, -1)
+
+
+def profile(raw):
+    """Missingness per column and per category, flagged ranges and imputation values, in one pass.
+
+    `raw` is the typed frame straight from the parser, before any rows are dropped.
+    The result is plain JSON-serializable data so it can be cached next to the snapshot.
+    """
+    missing = raw.isna()
+    missing_counts = missing.sum()
+    incomplete = missing.any(axis=1).to_numpy()
+    missing_columns = [column for column in raw.columns if missing_counts[column]]
+
+    columns = []
+    for column in raw.columns:
+        row = {'column': column, 'missing': int(missing_counts[column]), 'below': 0, 'above': 0}
+        if column in FLAG_RANGES:
+            values = raw[column].to_numpy(dtype=np.float64)
+            low, high = FLAG_RANGES[column]
+            row.update(below=int((values < low).sum()), above=int((values > high).sum()),
+                       min=float(np.nanmin(values)), max=float(np.nanmax(values)))
+        columns.append(row)
+
+    by_category = []
+    for factor in PROFILE_FACTORS:
+        codes, levels = factor_codes(raw[factor])
+        # Rows where the factor itself is missing get their own level
+        codes = np.where(codes < 0, len(levels), codes)
+        size = len(levels) + 1
+        counts = {'rows': np.bincount(codes, minlength=size), 'incomplete': np.bincount(codes, weights=incomplete, minlength=size)}
+        for column in missing_columns:
+            counts[f'missing:{column}'] = np.bincount(codes, weights=missing[column].to_numpy(), minlength=size)
+        for i, level in enumerate(levels + [None]):
+            if counts['rows'][i]:
+                by_category.append({'factor': factor, 'level': MISSING_LABEL if level is None else str(level),
+                                    **{name: int(values[i]) for name, values in counts.items()}})
+
+    # Imputation values per gender x age band group, with the overall value as the fallback
+    groups = impute_groups(raw)
+    fill = {}
+    for column in missing_columns:
+        if column in NOT_IMPUTED:
+            continue
+        values, observed = raw[column], ~missing[column].to_numpy() & (groups >= 0)
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_integer_dtype(values.dtype):
+            # Categories and 0/1 flags take the most frequent value, so a flag stays 0 or 1
+            level = str if isinstance(values.dtype, pd.CategoricalDtype) else int
+            table = pd.crosstab(groups[observed], values[observed])
+            fill[column] = {'groups': {str(g): level(table.loc[g].idxmax()) for g in table.index},
+                            'overall': level(values.mode().iloc[0])}
+        elif pd.api.types.is_numeric_dtype(values):
+            medians = values[observed].groupby(groups[observed]).median()
+            fill[column] = {'groups': {str(g): float(v) for g, v in medians.items()}, 'overall': float(values.median())}
+
+    return {'rows': int(len(raw)), 'complete_rows': int((~incomplete).sum()),
+            'columns': columns, 'by_category': by_category, 'fill': fill}
+
+
+def handle_missing(raw, policy, fill):
+    """Apply a MISSING_POLICIES entry to the raw frame, using the profile's fill values."""
+    if policy not in MISSING_POLICIES:
+        raise ValueError(f'unknown missing value policy {policy!r}, expected one of {MISSING_POLICIES}')
+    data = raw
+    if policy != 'drop':
+        data = raw.copy()
+        groups = impute_groups(raw)
+        for column, values in fill.items():
+            series = data[column]
+            rows = series.isna().to_numpy()
+            if not rows.any():
+                continue
+            if isinstance(series.dtype, pd.CategoricalDtype) and policy == 'category':
+                data[column] = series.cat.add_categories([MISSING_LABEL]).fillna(MISSING_LABEL)
+                continue
+            lookup = [values['groups'].get(str(g), values['overall']) for g in groups[rows]]
+            filled = series.copy()
+            filled[rows] = lookup
+            data[column] = filled
+    # Whatever is still missing (e.g. rows without a gender to group by) is dropped
+    return data.dropna().reset_index(drop=True)
+
+
+def column_table(profile):
+    table = pd.DataFrame(profile['columns']).set_index('column')
+    table.insert(1, 'missing_pct', table['missing'] / profile['rows'] * 100)
+    return table
+
+
+def category_table(profile):
+    return pd.DataFrame(profile['by_category']).set_index(['factor', 'level'])
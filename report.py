@@ -0,0 +1,217 @@
+"""Static HTML/PDF report of every chart in app.py, for the full dataset and optional cohorts.
+
+Charts come from the same builders the app uses (charts.py) and are rendered in
+parallel worker processes. Each image is stored under a key derived from the
+dataset fingerprint, the chart and the chart code, so a nightly run only
+re-renders what changed:
+
+    python report.py --out report
+    python report.py --out report --cohorts cohorts.json --format html pdf
+
+A cohorts file is a JSON list of the selections the app's Cohort Filter makes:
+
+    [{"name": "Women 50-65", "categories": {"gender": ["Female"]}, "ranges": {"age": [50, 65]}}]
+"""
+import argparse
+import base64
+import hashlib
+import html
+import inspect
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+
+import charts
+import chartspec
+from boxstats import grouped_box_stats
+from cohort import CohortIndex, describe_cohort, take_rows
+from correlation import CorrelationEngine
+from crosstab import FACTORS, age_groups, factor_table, stroke_crosstab
+from figcache import render
+from ingest import load_clean, write_atomic_json
+from settings import CACHE_DIR, DATA_PATH, FIGURE_THEME, MAX_FLIERS, RAW_RENDER_MAX_ROWS
+
+# Changing the chart code (or the titles and colors in chartspec) must invalidate rendered
+# images as much as changing the data
+CHART_CODE = hashlib.sha256((inspect.getsource(charts) + inspect.getsource(chartspec)).encode()).hexdigest()[:12]
+
+
+def chart_jobs(data):
+    """(chart id, title, builder name, args, kwargs) for every chart of the app, in app order."""
+    table = stroke_crosstab(data, FACTORS + ['age_group'], derived={'age_group': age_groups(data)})
+    histograms = {column: np.histogram(data[column], bins=20) for column, *_ in chartspec.MEASURES}
+    if len(data) > RAW_RENDER_MAX_ROWS:
+        box = ('box_plots_from_stats', ({column: grouped_box_stats(data, column, max_fliers=MAX_FLIERS) for column, *_ in chartspec.MEASURES},))
+    else:
+        box = ('box_plots', (data,))
+    jobs = [
+        ('distributions', 'Distributions of Age, Average Glucose Level, and BMI', 'distributions', (histograms,), {}),
+        ('box_plots', 'Box Plots of Age, Average Glucose Level, and BMI by Stroke Status', *box, {}),
+        ('correlation_heatmap', 'Correlation Matrix', 'correlation_heatmap', (CorrelationEngine().append(data).pearson(),), {}),
+        ('pie:work_type', 'Work Type Distribution', 'distribution_pie',
+         (factor_table(table, 'work_type')['total'].sort_values(ascending=False), 'Work Type Distribution'), {'legend_title': 'Work Type'}),
+        ('pie:Residence_type', 'Residence Type Distribution', 'distribution_pie',
+         (factor_table(table, 'Residence_type')['total'].sort_values(ascending=False), 'Residence Type Distribution'), {}),
+        ('pie:age_group', 'Age Group Distribution', 'distribution_pie',
+         (factor_table(table, 'age_group')['total'], 'Age Group Distribution'), {'legend_title': 'Age Groups'}),
+    ]
+    for subheader, factor, panels, colors, figsize in chartspec.STROKE_PIES:
+        jobs.append((f'stroke_pies:{factor}', subheader, 'stroke_pies', (table, factor, panels, colors, figsize), {}))
+    return jobs
+
+
+def image_key(fingerprint, chart_id, theme):
+    # The box plot settings decide which builder draws it and how many outliers it shows
+    settings = f'{MAX_FLIERS}|{RAW_RENDER_MAX_ROWS}'
+    return hashlib.sha256(f'{fingerprint}|{chart_id}|{theme}|{settings}|{CHART_CODE}'.encode()).hexdigest()[:16]
+
+
+def render_job(path, builder, args, kwargs, theme):
+    # Worker side: build one figure with the app's builder and write its PNG
+    png = render(lambda: getattr(charts, builder)(*args, **kwargs), theme=theme)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(png)
+    os.replace(tmp, path)
+    return path
+
+
+def load_cohorts(path):
+    with open(path) as f:
+        cohorts = json.load(f)
+    for i, cohort in enumerate(cohorts):
+        cohort.setdefault('name', f'Cohort {i + 1}')
+        cohort.setdefault('categories', {})
+        # JSON has no tuples; the cohort index expects (low, high) pairs
+        cohort['ranges'] = {column: tuple(bounds) for column, bounds in cohort.get('ranges', {}).items()}
+    return cohorts
+
+
+def datasets(data, cohorts):
+    """Yield (name, description, frame, fingerprint) for the full dataset and each cohort."""
+    fingerprint = data.attrs['fingerprint']
+    yield 'All patients', f'{len(data)} patients', data, fingerprint
+    if not cohorts:
+        return
+    index = CohortIndex(data)
+    for cohort in cohorts:
+        selection = {'categories': cohort['categories'], 'ranges': cohort['ranges']}
+        rows = index.select(selection)
+        if rows is None:
+            subset = data
+        elif len(rows) == 0:
+            print(f'skipping {cohort["name"]}: no patients match', file=sys.stderr)
+            continue
+        else:
+            subset = take_rows(data, rows, selection)
+        description = describe_cohort(selection, index) or 'no restrictions'
+        yield cohort['name'], f'{len(subset)} patients: {description}', subset, subset.attrs['fingerprint']
+
+
+def write_html(path, sections):
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>Stroke Prediction Dataset Report</title>',
+             '<style>body{font-family:sans-serif;max-width:1100px;margin:auto}img{max-width:100%}</style></head><body>',
+             '<h1>Stroke Prediction Dataset Report</h1>', f'<p>Generated {time.strftime("%Y-%m-%d %H:%M")}</p>']
+    for name, description, images in sections:
+        parts.append(f'<h2>{html.escape(name)}</h2><p>{html.escape(description)}</p>')
+        for title, image in images:
+            with open(image, 'rb') as f:
+                encoded = base64.b64encode(f.read()).decode()
+            parts.append(f'<h3>{html.escape(title)}</h3><img src="data:image/png;base64,{encoded}" alt="{html.escape(title)}">')
+    parts.append('</body></html>')
+    with open(path, 'w') as f:
+        f.write('\n'.join(parts))
+
+
+def write_pdf(path, sections):
+    # One page per chart, placed from the rendered PNGs so the PDF needs no second render
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(path) as pdf:
+        for name, description, images in sections:
+            for title, image in images:
+                pixels = plt.imread(image)
+                height, width = pixels.shape[:2]
+                fig = plt.figure(figsize=(11, 11 * height / width + 0.8))
+                fig.suptitle(f'{name}: {title}\n{description}', fontsize=9)
+                ax = fig.add_axes([0, 0, 1, 11 * height / width / (11 * height / width + 0.8)])
+                ax.imshow(pixels)
+                ax.axis('off')
+                pdf.savefig(fig)
+                plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DATA_PATH, help='source CSV (default: %(default)s)')
+    parser.add_argument('--cohorts', help='JSON file with a list of cohorts to report on as well')
+    parser.add_argument('--out', default='report', help='output directory (default: %(default)s)')
+    parser.add_argument('--format', nargs='+', choices=['html', 'pdf'], default=['html'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='render processes (default: %(default)s)')
+    parser.add_argument('--theme', default=FIGURE_THEME, help='matplotlib style (default: %(default)s)')
+    args = parser.parse_args(argv)
+    # seaborn deprecation notices would drown the progress output
+    warnings.simplefilter('ignore', FutureWarning)
+
+    images_dir = os.path.join(args.out, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    data = load_clean(args.data, CACHE_DIR)
+    cohorts = load_cohorts(args.cohorts) if args.cohorts else []
+
+    sections, pending = [], []
+    for name, description, frame, fingerprint in datasets(data, cohorts):
+        images = []
+        for chart_id, title, builder, chart_args, kwargs in chart_jobs(frame):
+            image = os.path.join(images_dir, f'{image_key(fingerprint, chart_id, args.theme)}.png')
+            images.append((title, image))
+            if not os.path.exists(image):
+                pending.append((image, builder, chart_args, kwargs, args.theme))
+        sections.append((name, description, images))
+
+    total = sum(len(images) for *_, images in sections)
+    print(f'{total - len(pending)} of {total} charts unchanged, rendering {len(pending)}', flush=True)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max(1, args.workers)) as pool:
+        for _ in pool.map(render_job, *zip(*pending)) if pending else ():
+            pass
+    print(f'rendered in {time.perf_counter() - start:.1f}s', flush=True)
+
+    # Drop images no longer referenced by this report
+    keep = {os.path.basename(image) for *_, images in sections for _, image in images}
+    for name in os.listdir(images_dir):
+        if name not in keep:
+            os.remove(os.path.join(images_dir, name))
+
+    # The documents themselves are only rewritten when their contents changed
+    manifest_path = os.path.join(args.out, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    contents = [(name, description, [(title, os.path.basename(image)) for title, image in images])
+                for name, description, images in sections]
+    contents_key = hashlib.sha256(json.dumps(contents).encode()).hexdigest()[:16]
+    for fmt, write in (('html', write_html), ('pdf', write_pdf)):
+        path = os.path.join(args.out, f'report.{fmt}')
+        if fmt not in args.format or (manifest.get(fmt) == contents_key and os.path.exists(path)):
+            continue
+        write(path, sections)
+        manifest[fmt] = contents_key
+        print(f'wrote {path}', flush=True)
+    write_atomic_json(manifest_path, manifest)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
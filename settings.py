@@ -0,0 +1,58 @@
+import os
+
+# Source CSV and the directory used for derived on-disk artifacts (snapshots, caches).
+# Both can be overridden per deployment through environment variables.
+DATA_PATH = os.environ.get('STROKE_APP_DATA', 'healthcare-dataset-stroke-data.csv')
+CACHE_DIR = os.environ.get('STROKE_APP_CACHE_DIR', '.cache')
+
+# Maximum number of computed aggregates kept in memory per app process (LRU eviction)
+AGGREGATE_CACHE_SIZE = int(os.environ.get('STROKE_APP_AGGREGATE_CACHE_SIZE', '128'))
+
+# Rendered figures: matplotlib style, image format ("png" or "svg") and in-memory cache budget
+FIGURE_THEME = os.environ.get('STROKE_APP_FIGURE_THEME', 'default')
+FIGURE_FORMAT = os.environ.get('STROKE_APP_FIGURE_FORMAT', 'png')
+FIGURE_CACHE_BYTES = int(os.environ.get('STROKE_APP_FIGURE_CACHE_MB', '64')) * 2**20
+
+# Out-of-core mode: "1" always streams the CSV in chunks, "0" never does, "auto" streams
+# files larger than STREAMING_THRESHOLD_MB instead of loading them into memory
+STREAMING = os.environ.get('STROKE_APP_STREAMING', 'auto')
+STREAMING_THRESHOLD_MB = int(os.environ.get('STROKE_APP_STREAMING_THRESHOLD_MB', '1024'))
+CHUNK_ROWS = int(os.environ.get('STROKE_APP_CHUNK_ROWS', '200000'))
+
+# Worker processes for aggregation; 1 keeps every computation in the app process
+WORKERS = int(os.environ.get('STROKE_APP_WORKERS', '1'))
+
+# Box plots of frames up to this many rows are drawn by seaborn from the raw rows; larger
+# ones from precomputed summaries with at most MAX_FLIERS sampled outliers per group
+RAW_RENDER_MAX_ROWS = int(os.environ.get('STROKE_APP_RAW_RENDER_MAX_ROWS', '50000'))
+MAX_FLIERS = int(os.environ.get('STROKE_APP_MAX_FLIERS', '200'))
+
+# Default chart renderer ("matplotlib" images or interactive "plotly") and the maximum
+# JSON payload per Plotly chart before its traces are coarsened
+RENDERER = os.environ.get('STROKE_APP_RENDERER', 'matplotlib')
+PLOTLY_PAYLOAD_BUDGET = int(os.environ.get('STROKE_APP_PLOTLY_PAYLOAD_KB', '256')) * 1024
+
+# Directory for per-section metrics (metrics.jsonl and metrics-<pid>.prom); empty disables export
+METRICS_DIR = os.environ.get('STROKE_APP_METRICS_DIR', '')
+
+# Incremental ingestion: "1" follows the CSV as it grows (plus any new CSV files matching
+# APPEND_GLOB) and only parses, cleans and aggregates the rows added since the last rerun
+INCREMENTAL = os.environ.get('STROKE_APP_INCREMENTAL', '0') == '1'
+APPEND_GLOB = os.environ.get('STROKE_APP_APPEND_GLOB', '')
+
+# Directory of the memory-mapped Arrow copy of the cleaned data shared by every app process
+# on the host (published once, attached zero-copy); empty gives each process its own copy
+SHARED_DIR = os.environ.get('STROKE_APP_SHARED_DIR', '')
+
+# Rows with missing values (N/A BMI, Unknown smoking status): "drop" them, "impute" them from
+# gender and age band medians/modes, or keep missing categories as an explicit "category"
+MISSING_POLICY = os.environ.get('STROKE_APP_MISSING_POLICY', 'drop')
+
+# Bootstrap replicates and generator seed of the stroke rate confidence intervals in the Pie Charts view
+BOOTSTRAP_RESAMPLES = int(os.environ.get('STROKE_APP_BOOTSTRAP_RESAMPLES', '2000'))
+BOOTSTRAP_SEED = int(os.environ.get('STROKE_APP_BOOTSTRAP_SEED', '0'))
+
+# Background worker threads for chart renders and long aggregations (0 runs them in the
+# script thread as before) and how often a waiting page checks on them, in seconds
+JOB_WORKERS = int(os.environ.get('STROKE_APP_JOB_WORKERS', '2'))
+JOB_POLL_SECONDS = float(os.environ.get('STROKE_APP_JOB_POLL_SECONDS', '0.5'))
@@ -0,0 +1,126 @@
+"""Cleaned dataset published once as a memory-mapped Arrow file for every app process.
+
+One process (whichever takes the publisher lock first, or an explicit
+`python shared.py`) loads and cleans the CSV and writes the columns to an
+uncompressed Arrow IPC file named after the dataset version. A small
+`current.json` pointer names the live version. App processes map that file and
+wrap its buffers in pandas without copying, so N replicas on one host share one
+page-cache copy of the data, and re-attach when the pointer moves.
+"""
+import argparse
+import json
+import os
+import threading
+import pyarrow.feather as feather
+
+from ingest import file_lock, load_clean, source_key, write_atomic_json
+from instrument import section
+from settings import CACHE_DIR, DATA_PATH, SHARED_DIR
+
+
+def publisher_lock(directory):
+    # Advisory lock across processes: only one of them loads and publishes at a time. fcntl
+    # is only imported here, so the app still starts on Windows as long as SHARED_DIR is unset
+    return file_lock(os.path.join(directory, 'publish.lock'))
+
+
+def read_pointer(directory):
+    try:
+        with open(os.path.join(directory, 'current.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish(directory=SHARED_DIR, path=DATA_PATH, cache_dir=CACHE_DIR):
+    """Load and clean `path`, write it as `<version>.arrow` and point current.json at it."""
+    with publisher_lock(directory):
+        data = load_clean(path, cache_dir)
+        version = data.attrs['fingerprint']
+        pointer = read_pointer(directory)
+        if pointer is not None and pointer['version'] == version:
+            return pointer
+
+        target = os.path.join(directory, f'{version}.arrow')
+        tmp = f'{target}.{os.getpid()}.tmp'
+        feather.write_feather(data, tmp, compression='uncompressed')
+        os.replace(tmp, target)
+        pointer = {'version': version, 'file': os.path.basename(target), 'source_key': source_key(path, cache_dir),
+                   'source': data.attrs['source']}
+        write_atomic_json(os.path.join(directory, 'current.json'), pointer)
+
+        # Processes still mapping an older version keep their pages until they re-attach
+        for name in os.listdir(directory):
+            if name.endswith('.arrow') and name != pointer['file']:
+                os.remove(os.path.join(directory, name))
+        return pointer
+
+
+def attach(directory, pointer):
+    # Zero-copy for the numeric columns: the frame's arrays are read-only views of the mapping
+    table = feather.read_table(os.path.join(directory, pointer['file']), memory_map=True)
+    data = table.to_pandas(split_blocks=True)
+    data.attrs['fingerprint'] = pointer['version']
+    if 'source' in pointer:
+        data.attrs['source'] = pointer['source']
+    return data
+
+
+class SharedDataset:
+    """The current published frame, re-attached whenever the version stamp changes.
+
+    `current()` costs two stat calls when nothing changed. If the pointer is missing
+    or was published from an older copy of the CSV, this process publishes it.
+    """
+
+    def __init__(self, directory=SHARED_DIR, path=DATA_PATH, cache_dir=CACHE_DIR):
+        self.directory = directory
+        self.path = path
+        self.cache_dir = cache_dir
+        self.data = None
+        self.version = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def _watch(self):
+        source = os.stat(self.path)
+        try:
+            pointer_mtime = os.stat(os.path.join(self.directory, 'current.json')).st_mtime_ns
+        except OSError:
+            pointer_mtime = None
+        return source.st_size, source.st_mtime_ns, pointer_mtime
+
+    def current(self):
+        with self._lock:
+            stat = self._watch()
+            if stat == self._stat:
+                return self.data
+            pointer = read_pointer(self.directory)
+            if pointer is None or pointer.get('source_key') != source_key(self.path, self.cache_dir):
+                pointer = publish(self.directory, self.path, self.cache_dir)
+            if pointer['version'] != self.version:
+                with section('ingest.attach') as span:
+                    try:
+                        self.data = attach(self.directory, pointer)
+                    except FileNotFoundError:
+                        # A newer version was published (and the old file removed) in between
+                        pointer = read_pointer(self.directory)
+                        self.data = attach(self.directory, pointer)
+                    span.rows = len(self.data)
+                self.version = pointer['version']
+            self._stat = self._watch()
+            return self.data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=SHARED_DIR or os.path.join(CACHE_DIR, 'shared'),
+                        help='directory the app processes attach from (default: %(default)s)')
+    parser.add_argument('--data', default=DATA_PATH, help='source CSV (default: %(default)s)')
+    args = parser.parse_args(argv)
+    pointer = publish(args.dir, args.data)
+    print(f'published version {pointer["version"]} to {os.path.join(args.dir, pointer["file"])}')
+
+
+if __name__ == '__main__':
+    main()
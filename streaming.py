@@ -0,0 +1,291 @@
+import numpy as np
+import pandas as pd
+
+from crosstab import FACTORS, age_groups, factor_codes
+from ingest import CATEGORIES, clean, read_csv_typed
+
+# Numeric columns in the order pandas' describe()/corr() report them
+NUMERIC_COLUMNS = ['id', 'age', 'hypertension', 'heart_disease', 'avg_glucose_level', 'bmi', 'stroke']
+CORRELATION_COLUMNS = NUMERIC_COLUMNS[1:]
+MEASURE_COLUMNS = ['age', 'avg_glucose_level', 'bmi']
+
+# Fixed histogram domains; values outside are counted in the first/last bin
+HISTOGRAM_RANGES = {'age': (0, 100), 'avg_glucose_level': (0, 400), 'bmi': (0, 100)}
+
+
+class Moments:
+    """Count, sum, sum of squares, min and max per column; enough for mean/std."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.count = np.zeros(k)
+        self.sum = np.zeros(k)
+        self.sumsq = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, values):
+        # values: (rows, columns) float64 array without NaN
+        if not len(values):
+            return
+        self.count += len(values)
+        self.sum += values.sum(axis=0)
+        self.sumsq += (values * values).sum(axis=0)
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    def mean(self):
+        return self.sum / self.count
+
+    def std(self):
+        # Sample standard deviation, as pandas reports it
+        var = (self.sumsq - self.sum * self.sum / self.count) / (self.count - 1)
+        return np.sqrt(np.maximum(var, 0))
+
+
+class FixedHistogram:
+    def __init__(self, low, high, bins=20):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def update(self, values):
+        self.counts += np.histogram(np.clip(values, self.edges[0], self.edges[-1]), bins=self.edges)[0]
+
+    def merge(self, other):
+        self.counts += other.counts
+
+
+class QuantileSketch:
+    """Mergeable streaming quantile sketch (KLL-style compactors).
+
+    Level i holds items of weight 2**i; a full level is sorted and every other
+    item (random offset) is promoted, so memory stays O(k log(n / k)).
+    """
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for i, items in enumerate(other.levels):
+            if i == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[i] = np.concatenate([self.levels[i], items])
+        self._compress()
+
+    def _compress(self):
+        i = 0
+        while i < len(self.levels):
+            items = self.levels[i]
+            if len(items) > self.k:
+                items = np.sort(items)
+                if len(items) % 2:
+                    # Keep one item back so the promoted half is exactly half the weight
+                    self.levels[i], items = items[-1:], items[:-1]
+                else:
+                    self.levels[i] = np.empty(0)
+                promoted = items[self._rng.integers(2)::2]
+                if i + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[i + 1] = np.concatenate([self.levels[i + 1], promoted])
+            i += 1
+
+    def quantiles(self, qs):
+        if not self.n:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** i) for i, level in enumerate(self.levels)])
+        order = np.argsort(items)
+        items, cumulative = items[order], np.cumsum(weights[order])
+        # Same linear interpolation as numpy/pandas on the weighted ranks
+        ranks = np.asarray(qs) * (cumulative[-1] - 1)
+        result = np.interp(ranks, cumulative - weights[order] / 2 - 0.5, items)
+        result[np.asarray(qs) <= 0] = self.min
+        result[np.asarray(qs) >= 1] = self.max
+        return result
+
+
+class CoMoments:
+    """n, column sums and the cross-product matrix X^T X: sufficient for Pearson correlations."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.sum = np.zeros(k)
+        self.cross = np.zeros((k, k))
+
+    def update(self, values):
+        self.n += len(values)
+        self.sum += values.sum(axis=0)
+        self.cross += values.T @ values
+
+    def merge(self, other):
+        self.n += other.n
+        self.sum += other.sum
+        self.cross += other.cross
+
+    def correlation(self):
+        mean = self.sum / self.n
+        cov = (self.cross - self.n * np.outer(mean, mean)) / (self.n - 1)
+        sd = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(sd, sd)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class StrokeCounts:
+    """Stroke / no-stroke counts per level of every categorical factor and age group."""
+
+    def __init__(self, factors=FACTORS + ['age_group']):
+        self.factors = list(factors)
+        self.counts = {factor: None for factor in self.factors}
+        self.levels = {}
+
+    def update(self, chunk):
+        y = chunk['stroke'].to_numpy().astype(np.int64)
+        for factor in self.factors:
+            if factor == 'age_group':
+                codes, levels = factor_codes(age_groups(chunk))
+            elif factor in CATEGORIES:
+                codes, levels = factor_codes(chunk[factor])
+            else:
+                # 0/1 flags: the value is the code, whatever levels this chunk happens to contain
+                codes, levels = chunk[factor].to_numpy().astype(np.int64), [0, 1]
+            valid = codes >= 0
+            counts = np.bincount(codes[valid] * 2 + y[valid], minlength=2 * len(levels)).reshape(-1, 2)
+            self._add(factor, levels, counts)
+
+    def _add(self, factor, levels, counts):
+        if self.counts[factor] is None:
+            self.counts[factor], self.levels[factor] = counts, list(levels)
+        else:
+            self.counts[factor] = self.counts[factor] + counts
+
+    def merge(self, other):
+        for factor in self.factors:
+            if other.counts[factor] is not None:
+                self._add(factor, other.levels[factor], other.counts[factor])
+
+    def table(self):
+        # Same tidy layout as crosstab.stroke_crosstab()
+        rows = []
+        for factor in self.factors:
+            if self.counts[factor] is None:
+                continue
+            for level, (no_stroke, stroke) in zip(self.levels[factor], self.counts[factor]):
+                rows.append((factor, level, no_stroke, stroke))
+        table = pd.DataFrame(rows, columns=['factor', 'level', 'no_stroke', 'stroke'])
+        table['total'] = table['no_stroke'] + table['stroke']
+        table['rate'] = table['stroke'] / table['total'].where(table['total'] > 0)
+        return table
+
+
+class StreamingSummary:
+    """All aggregates the Descriptive Statistics, Distributions, Box Plots,
+    Correlation Matrix and Pie Charts sections need, folded chunk by chunk."""
+
+    def __init__(self):
+        self.rows = 0
+        self.moments = Moments(NUMERIC_COLUMNS)
+        self.sketches = {column: QuantileSketch() for column in NUMERIC_COLUMNS}
+        self.group_sketches = {(column, group): QuantileSketch() for column in MEASURE_COLUMNS for group in (0, 1)}
+        self.histograms = {column: FixedHistogram(*HISTOGRAM_RANGES[column]) for column in MEASURE_COLUMNS}
+        self.comoments = CoMoments(CORRELATION_COLUMNS)
+        self.stroke_counts = StrokeCounts()
+
+    def update(self, chunk):
+        # chunk is an already cleaned, typed frame
+        self.rows += len(chunk)
+        values = chunk[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+        self.moments.update(values)
+        self.comoments.update(values[:, 1:])
+        for i, column in enumerate(NUMERIC_COLUMNS):
+            self.sketches[column].update(values[:, i])
+        stroke = chunk['stroke'].to_numpy()
+        for column in MEASURE_COLUMNS:
+            measure = chunk[column].to_numpy(dtype=np.float64)
+            self.histograms[column].update(measure)
+            for group in (0, 1):
+                self.group_sketches[column, group].update(measure[stroke == group])
+        self.stroke_counts.update(chunk)
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.moments.merge(other.moments)
+        self.comoments.merge(other.comoments)
+        self.stroke_counts.merge(other.stroke_counts)
+        for column in NUMERIC_COLUMNS:
+            self.sketches[column].merge(other.sketches[column])
+        for key, sketch in self.group_sketches.items():
+            sketch.merge(other.group_sketches[key])
+        for column, histogram in self.histograms.items():
+            histogram.merge(other.histograms[column])
+
+    def describe(self):
+        quartiles = np.array([self.sketches[column].quantiles([0.25, 0.5, 0.75]) for column in NUMERIC_COLUMNS])
+        return pd.DataFrame({
+            'count': self.moments.count,
+            'mean': self.moments.mean(),
+            'std': self.moments.std(),
+            'min': self.moments.min,
+            '25%': quartiles[:, 0],
+            '50%': quartiles[:, 1],
+            '75%': quartiles[:, 2],
+            'max': self.moments.max,
+        }, index=NUMERIC_COLUMNS).T
+
+    def histogram(self, column):
+        hist = self.histograms[column]
+        return hist.counts, hist.edges
+
+    def box_stats(self, column):
+        # Matplotlib bxp() statistics per stroke group; whiskers at 1.5 IQR clipped to the data
+        stats = []
+        for group in (0, 1):
+            sketch = self.group_sketches[column, group]
+            q1, med, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+            iqr = q3 - q1
+            stats.append({
+                'label': str(group), 'med': med, 'q1': q1, 'q3': q3,
+                'whislo': max(sketch.min, q1 - 1.5 * iqr), 'whishi': min(sketch.max, q3 + 1.5 * iqr),
+                'fliers': np.empty(0),
+            })
+        return stats
+
+    def correlation(self):
+        return self.comoments.correlation()
+
+
+def summarize_csv(path, chunksize=200_000):
+    """Fold a CSV of any size into a StreamingSummary, one cleaned chunk at a time."""
+    summary = StreamingSummary()
+    for chunk in read_csv_typed(path, chunksize=chunksize):
+        summary.update(clean(chunk))
+    return summary
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import CorrelationEngine, betainc, correlation_pvalue, phi_pvalue
+from ingest import load_clean
+
+
+@pytest.mark.parametrize('a, b, x', [(2.5, 0.5, 0.3), (0.5, 0.5, 0.9), (40.0, 0.5, 0.999), (1.0, 3.0, 0.2)])
+def test_betainc_closed_forms(a, b, x):
+    # I_x(a, b) = 1 - I_(1-x)(b, a); I_x(1, b) = 1 - (1-x)^b; I_x(a, 1) = x^a
+    assert betainc(a, b, x) == pytest.approx(1 - betainc(b, a, 1 - x), abs=1e-12)
+    assert betainc(1.0, b, x) == pytest.approx(1 - (1 - x) ** b, rel=1e-11)
+    assert betainc(a, 1.0, x) == pytest.approx(x ** a, rel=1e-11)
+
+
+def test_pvalue_edge_cases():
+    assert correlation_pvalue(0.0, 100) == pytest.approx(1.0)
+    assert correlation_pvalue(1.0, 100) == 0.0
+    assert np.isnan(correlation_pvalue(0.5, 2))
+    assert np.isnan(phi_pvalue(np.nan, 100))
+
+
+def test_pvalues_match_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    data = load_clean()
+    engine = CorrelationEngine(keep_ranks=True).append(data)
+    values = {column: data[column].to_numpy(dtype=np.float64) for column in engine.columns}
+
+    pearson, spearman = engine.pvalues('pearson'), engine.pvalues('spearman')
+    kinds = engine.kinds()
+    for a in engine.columns:
+        for b in engine.columns:
+            if a == b:
+                continue
+            if kinds.loc[a, b] == 'phi':
+                r = engine.pearson().loc[a, b]
+                expected = stats.chi2.sf(len(data) * r * r, 1)
+            else:
+                expected = stats.pearsonr(values[a], values[b]).pvalue
+            assert pearson.loc[a, b] == pytest.approx(expected, rel=1e-9, abs=1e-300)
+            assert spearman.loc[a, b] == pytest.approx(stats.spearmanr(values[a], values[b]).pvalue, rel=1e-9, abs=1e-300)
+
+
+def test_matrices_match_pandas():
+    data = load_clean()
+    engine = CorrelationEngine(keep_ranks=True).append(data)
+    frame = data[engine.columns].astype(np.float64)
+    pd.testing.assert_frame_equal(engine.matrix('pearson'), frame.corr(), atol=1e-12)
+    pd.testing.assert_frame_equal(engine.matrix('spearman'), frame.corr('spearman'), atol=1e-12)
+
+
+def test_appends_match_a_single_build():
+    data = load_clean()
+    whole = CorrelationEngine(keep_ranks=True).append(data)
+    first = CorrelationEngine(keep_ranks=True).append(data.iloc[:1000])
+    # copy() is what the incremental store publishes; the original must not see the append
+    grown = first.copy().append(data.iloc[1000:])
+    assert first.n == 1000 and grown.n == len(data)
+    pd.testing.assert_frame_equal(grown.matrix('pearson'), whole.matrix('pearson'), atol=1e-12)
+    pd.testing.assert_frame_equal(grown.matrix('spearman'), whole.matrix('spearman'), atol=1e-12)
+
+
+def test_spearman_needs_the_rank_cache():
+    with pytest.raises(ValueError, match='keep_ranks'):
+        CorrelationEngine().append(load_clean()).spearman()
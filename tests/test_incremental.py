@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import CorrelationEngine
+from incremental import IncrementalStore
+from ingest import DATA_PATH, clean, read_csv_typed
+
+
+@pytest.fixture(scope='module')
+def lines():
+    with open(DATA_PATH) as f:
+        return f.read().splitlines()
+
+
+def write(path, lines, tail=''):
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n' + tail)
+
+
+def full_load(path):
+    return clean(read_csv_typed(path))
+
+
+def assert_matches_full_load(snapshot, path):
+    expected = full_load(path)
+    pd.testing.assert_frame_equal(snapshot.data, expected)
+    assert snapshot.summary.rows == len(expected)
+    engine = CorrelationEngine(keep_ranks=True).append(expected)
+    for method in ('pearson', 'spearman'):
+        pd.testing.assert_frame_equal(snapshot.correlation.matrix(method), engine.matrix(method), atol=1e-12)
+
+
+def test_partial_last_line_waits_for_its_newline(tmp_path, lines):
+    path, cache = str(tmp_path / 'registry.csv'), str(tmp_path / 'cache')
+    header, rows = lines[0], lines[1:]
+    # A writer is half way through row 2001
+    write(path, [header] + rows[:2000], tail=rows[2000][:25])
+    store = IncrementalStore(path, cache)
+    first = store.refresh()
+    complete = str(tmp_path / 'complete.csv')
+    write(complete, [header] + rows[:2000])
+    assert_matches_full_load(first, complete)
+    assert store.manifest['offset'] == os.path.getsize(complete)
+
+    with open(path, 'a') as f:
+        f.write(rows[2000][25:] + '\n' + '\n'.join(rows[2001:]) + '\n')
+    second = store.refresh()
+    assert second.version != first.version
+    assert_matches_full_load(second, path)
+    # The snapshot sessions still hold is left as it was
+    assert len(first.data) < len(second.data)
+    assert store.refresh() is second
+
+
+def test_reopen_reuses_the_parts_of_the_manifest(tmp_path, lines):
+    path, cache = str(tmp_path / 'registry.csv'), str(tmp_path / 'cache')
+    write(path, lines[:3001])
+    IncrementalStore(path, cache).refresh()
+    write(path, lines)
+    grown = IncrementalStore(path, cache).refresh()
+    parts = sorted(os.listdir(os.path.join(cache, 'registry-parts-v1')))
+
+    reopened = IncrementalStore(path, cache)
+    snapshot = reopened.refresh()
+    assert snapshot.version == grown.version
+    assert sorted(os.listdir(os.path.join(cache, 'registry-parts-v1'))) == parts
+    assert len(reopened.manifest['parts']) == 2
+    assert_matches_full_load(snapshot, path)
+
+
+def test_rewritten_registry_is_rebuilt(tmp_path, lines):
+    path, cache = str(tmp_path / 'registry.csv'), str(tmp_path / 'cache')
+    write(path, lines)
+    store = IncrementalStore(path, cache)
+    before = store.refresh()
+
+    # Same header, different first rows: not an append, so nothing of the old store is kept
+    write(path, [lines[0]] + lines[11:])
+    assert_matches_full_load(IncrementalStore(path, cache).refresh(), path)
+    after = store.refresh()
+    assert after.version != before.version
+    assert_matches_full_load(after, path)
+
+
+def test_drops_only_add_ids_above_the_high_water_mark(tmp_path, lines):
+    path, cache = str(tmp_path / 'registry.csv'), str(tmp_path / 'cache')
+    ordered = [lines[0]] + sorted(lines[1:], key=lambda line: int(line.split(',')[0]))
+    write(path, ordered[:3001])
+    # The drop repeats the last 500 rows of the registry before the new ones
+    write(str(tmp_path / 'drop-1.csv'), [lines[0]] + ordered[2501:])
+    store = IncrementalStore(path, cache, append_glob=str(tmp_path / 'drop-*.csv'))
+    snapshot = store.refresh()
+    write(str(tmp_path / 'all.csv'), ordered)
+    assert_matches_full_load(snapshot, str(tmp_path / 'all.csv'))
+    assert np.all(np.diff(snapshot.data['id'].to_numpy()) > 0)
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from ingest import clean, load_clean, read_csv_typed
+
+HEADER = 'id,gender,age,hypertension,heart_disease,ever_married,work_type,Residence_type,avg_glucose_level,bmi,smoking_status,stroke\n'
+
+
+def test_unseen_category_levels_are_rejected(tmp_path):
+    path = tmp_path / 'extract.csv'
+    path.write_text(HEADER +
+                    '1,Male,67,0,1,Yes,Private,Urban,228.69,36.6,formerly smoked,1\n'
+                    '2,Female,61,0,0,Yes,Contractor,Rural,202.21,N/A,Unknown,1\n')
+    with pytest.raises(ValueError, match="work_type: 'Contractor'"):
+        read_csv_typed(path)
+    with pytest.raises(ValueError, match='Contractor'):
+        list(read_csv_typed(path, chunksize=1))
+
+
+def test_missing_markers_still_parse_as_na(tmp_path):
+    path = tmp_path / 'extract.csv'
+    path.write_text(HEADER + '2,Female,61,0,0,Yes,Private,Rural,202.21,N/A,Unknown,1\n')
+    raw = read_csv_typed(path)
+    assert raw['bmi'].isna().all() and raw['smoking_status'].isna().all()
+    assert list(raw['work_type'].cat.categories) == ['Govt_job', 'Never_worked', 'Private', 'Self-employed', 'children']
+
+
+def test_blank_flag_is_a_missing_value(tmp_path):
+    path = tmp_path / 'extract.csv'
+    path.write_text(HEADER +
+                    '1,Male,67,,1,Yes,Private,Urban,228.69,36.6,formerly smoked,1\n'
+                    '2,Female,61,0,0,Yes,Private,Rural,202.21,28.1,never smoked,\n'
+                    '3,Male,80,0,1,Yes,Private,Rural,105.92,32.5,never smoked,1\n')
+    raw = read_csv_typed(path)
+    assert raw['hypertension'].isna().sum() == 1 and raw['stroke'].isna().sum() == 1
+    data = clean(raw)
+    assert list(data['id']) == [3]
+    assert data['hypertension'].dtype == 'int8' and data['id'].dtype == 'int32'
+
+
+def test_new_snapshot_replaces_the_stale_ones(tmp_path):
+    path, cache = tmp_path / 'extract.csv', tmp_path / 'cache'
+    rows = ['1,Male,67,0,1,Yes,Private,Urban,228.69,36.6,formerly smoked,1\n',
+            '2,Female,61,0,0,Yes,Private,Rural,202.21,N/A,Unknown,1\n']
+    path.write_text(HEADER + rows[0])
+    load_clean(str(path), str(cache), 'drop')
+    load_clean(str(path), str(cache), 'impute')
+    old = sorted(name for name in os.listdir(cache) if name.startswith('extract-'))
+    assert len(old) == 3  # two snapshots and the profile
+
+    path.write_text(HEADER + ''.join(rows))
+    data = load_clean(str(path), str(cache), 'drop')
+    new = sorted(name for name in os.listdir(cache) if name.startswith('extract-'))
+    assert len(new) == 2 and not set(old) & set(new)
+    assert all(data.attrs['fingerprint'].split('-')[0] in name for name in new)
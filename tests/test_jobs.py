@@ -0,0 +1,52 @@
+import pytest
+
+from jobs import JobScheduler
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_failed_job_is_kept_until_retried(workers):
+    scheduler = JobScheduler(workers)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise MemoryError('transient')
+        return 'ok'
+
+    first = scheduler.submit(('fp', 'chart'), flaky, 'session-a')
+    first.wait()
+    with pytest.raises(MemoryError):
+        first.result()
+    assert isinstance(first.error(), MemoryError)
+
+    # Without retry (the progress fragment's rerun) the session sees the same failed job
+    assert scheduler.submit(('fp', 'chart'), flaky, 'session-a') is first
+    assert len(calls) == 1
+
+    second = scheduler.submit(('fp', 'chart'), flaky, 'session-b', retry=True)
+    second.wait()
+    assert second is not first
+    assert second.result() == 'ok'
+    assert second.error() is None
+    assert len(calls) == 2
+
+
+def test_finished_job_is_not_retained():
+    scheduler = JobScheduler(1)
+    cache = {}
+
+    def render():
+        # Stands in for a computation that stores its result in one of the app's caches
+        return cache.setdefault('chart', object())
+
+    first = scheduler.submit(('fp', 'chart'), render, 'session-a')
+    first.wait()
+    assert scheduler.stats()['finished'] == 1
+    assert ('fp', 'chart') not in scheduler._jobs
+
+    # A recently finished key runs inline and reads its result back from the cache
+    second = scheduler.submit(('fp', 'chart'), render, 'session-b')
+    assert second.done()
+    assert second.result() is first.result()
+    assert scheduler.stats()['reused'] == 1
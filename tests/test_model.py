@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from ingest import load_clean
+from model import RiskModel
+
+
+def test_score_follows_rows_of_a_reordered_slice():
+    data = load_clean()
+    risk = RiskModel.train(data, key=data.attrs['fingerprint'])
+    full = risk.score(data)
+
+    reordered = data.iloc[::-1]
+    scores = risk.score(reordered)
+    pd.testing.assert_frame_equal(scores, full.iloc[::-1])
+
+    head = risk.score(data.head(5))
+    assert len(head) == 5
+    np.testing.assert_allclose(head.to_numpy(), full.head(5).to_numpy())
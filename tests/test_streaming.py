@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from crosstab import FACTORS, age_groups, stroke_crosstab
+from ingest import DATA_PATH, load_clean
+from parallel import csv_ranges, merge, summarize_csv_range
+from streaming import CORRELATION_COLUMNS, NUMERIC_COLUMNS, QuantileSketch, summarize_csv
+
+QS = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def rank_error(sketch, values):
+    # How far the estimated quantiles' ranks are from the requested ones, as a share of n
+    ordered = np.sort(values)
+    ranks = np.searchsorted(ordered, sketch.quantiles(QS)) / len(ordered)
+    return np.abs(ranks - QS).max()
+
+
+def test_sketch_is_exact_below_its_capacity():
+    values = np.random.default_rng(1).normal(size=1000)
+    sketch = QuantileSketch(k=2048)
+    sketch.update(values)
+    np.testing.assert_allclose(sketch.quantiles(QS), np.quantile(values, QS))
+    assert sketch.quantiles([0, 1]).tolist() == [values.min(), values.max()]
+
+
+def test_sketch_and_merge_stay_within_rank_error():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.lognormal(size=150_000), rng.normal(5, 1, size=150_000)])
+    rng.shuffle(values)
+    single, left, right = QuantileSketch(), QuantileSketch(seed=1), QuantileSketch(seed=2)
+    for chunk in np.array_split(values, 30):
+        single.update(chunk)
+    for chunk in np.array_split(values[:100_000], 7):
+        left.update(chunk)
+    right.update(values[100_000:])
+    left.merge(right)
+
+    assert left.n == single.n == len(values)
+    assert rank_error(single, values) < 0.01
+    assert rank_error(left, values) < 0.01
+    # Memory is bounded by the compactors, not the number of values
+    assert sum(len(level) for level in left.levels) < 20 * left.k
+
+
+@pytest.fixture(scope='module')
+def data():
+    return load_clean(policy='drop')
+
+
+@pytest.fixture(scope='module')
+def summary():
+    return summarize_csv(DATA_PATH, chunksize=700)
+
+
+def test_chunked_summary_matches_pandas(data, summary):
+    expected = data[NUMERIC_COLUMNS].astype(np.float64).describe()
+    described = summary.describe()
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    pd.testing.assert_frame_equal(described.loc[exact], expected.loc[exact], rtol=1e-9)
+    # The quartiles come from the sketches, so they are close rather than exact
+    pd.testing.assert_frame_equal(described.loc[['25%', '50%', '75%']], expected.loc[['25%', '50%', '75%']], rtol=1e-2)
+    pd.testing.assert_frame_equal(summary.correlation(), data[CORRELATION_COLUMNS].astype(np.float64).corr(), atol=1e-12)
+
+
+def test_chunked_crosstab_matches_a_full_pass(data, summary):
+    expected = stroke_crosstab(data, FACTORS + ['age_group'], derived={'age_group': age_groups(data)})
+    table = summary.stroke_counts.table()
+    pd.testing.assert_frame_equal(table.drop(columns='level'), expected.drop(columns='level'), check_dtype=False)
+    assert [str(level) for level in table['level']] == [str(level) for level in expected['level']]
+
+
+def test_range_partials_merge_to_the_full_summary(summary):
+    names, ranges = csv_ranges(DATA_PATH, 3)
+    merged = merge(summarize_csv_range(DATA_PATH, start, end, names, 500) for start, end in ranges)
+    assert merged.rows == summary.rows
+    pd.testing.assert_frame_equal(merged.correlation(), summary.correlation(), atol=1e-12)
+    pd.testing.assert_frame_equal(merged.stroke_counts.table(), summary.stroke_counts.table())